@@ -1,17 +1,42 @@
-from src.ui.ui_layout import create_ui
-from dotenv import load_dotenv
-from src.db.db import init_db
+import asyncio
+import logging
+import os
 
 
-load_dotenv()
-init_db()
+def main() -> None:
+    # Imported and set up here, not at module level: spawned chunking
+    # workers re-import this module, and must not load the UI stack, touch
+    # the DB or change the event loop policy.
+    from src.db.db import init_db
+    from src.ui.ui_layout import create_ui
+    from src.ui.ui_runtime import shutdown
 
+    # Use libuv-based event loop when available (not supported on Windows).
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    # .env is already loaded when src.core.sidekick is imported (via create_ui)
+    init_db()
 
-if __name__ == "__main__":
     demo = create_ui(css_path="static/style.css")
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,
         inbrowser=True,
         share=False
-    )
\ No newline at end of file
+    )
+    # launch() returns once the server has stopped (e.g. Ctrl+C)
+    asyncio.run(shutdown())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,79 +2,200 @@
 Construction of LangGraph Graph.
 """
 
+import asyncio
+import logging
+import os
+import time
 from datetime import datetime
 
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import END, START, StateGraph
 from langgraph.prebuilt import ToolNode
 
-from src.core.state import SidekickState
+from src.core.response_cache import make_cache_scope
+from src.core.state import GraphState
+
+logger = logging.getLogger("sidekick.graph")
+
+# Mark the static system prefix with cache_control (Anthropic-style prompt
+# caching). Off by default: not every provider accepts the extra field.
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "0") == "1"
+
+# How many recent user/assistant exchanges identify a prompt for the
+# response cache
+_CACHE_CONTEXT_MESSAGES = 2
+
+# Static part of the worker system prompt (only the tail changes per turn)
+_SYSTEM_PREFIX = (
+    "You are a helpful assistant with access to several external tools.\n"
+    "Some tools may be *disabled* depending on user settings. Always use tools only when "
+    "they are clearly helpful and necessary.\n\n"
+
+    "NOTES:\n"
+    "- If a tool is disabled for this run, do not attempt to call it.\n"
+    "- Use tools sparingly and only when needed to answer the user's question.\n"
+    "- When using the Python tool, always use print() to show results. Bare expressions will not display values.\n"
+    "- Whenever you write mathematical expressions in LaTeX, you MUST always use block delimiters with double dollar signs $$ ... $$"
+    "- In each turn use a tool a maximum of 3 times, if you cannot complete the tasks say so and explain what happened.\n\n"
+)
+
+
+# Compiled once; the system text is token-for-token stable except for the
+# two trailing variables, so providers can reuse the cached prompt prefix.
+_WORKER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            _SYSTEM_PREFIX
+            + "Success criteria: {success_criteria}\n"
+            + "Current time: {current_time}\n",
+        ),
+        MessagesPlaceholder("history"),
+    ]
+)
+
+# Used when PROMPT_CACHE_CONTROL is on: the system message is passed in
+# pre-built, since it carries structured content blocks.
+_CACHE_CONTROL_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        MessagesPlaceholder("system"),
+        MessagesPlaceholder("history"),
+    ]
+)
+
+
+def _cache_control_system_message(success_criteria: str, current_time: str) -> SystemMessage:
+    """System message whose static prefix block is marked as cacheable."""
+    return SystemMessage(
+        content=[
+            {
+                "type": "text",
+                "text": _SYSTEM_PREFIX,
+                "cache_control": {"type": "ephemeral"},
+            },
+            {
+                "type": "text",
+                "text": f"Success criteria: {success_criteria}\nCurrent time: {current_time}\n",
+            },
+        ]
+    )
+
+
+# (epoch minute, formatted time); only reformatted when the minute changes,
+# which also keeps the system prompt byte-identical within that minute.
+_time_cache = (0, "")
+
+
+def _now_minute() -> str:
+    global _time_cache
+    minute = int(time.time() // 60)
+    if minute != _time_cache[0]:
+        _time_cache = (minute, datetime.now().strftime("%Y-%m-%d %H:%M"))
+    return _time_cache[1]
+
+
+# -------------------- Edge conditions --------------------
+
+def route_worker(state: GraphState) -> str:
+    """
+    Decide if need to use tools or end (an empty tool_calls list ends)
+    """
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
+    return "tools" if tool_calls else "end"
 
 
 class GraphBuilder:
     """Constructor of the Graph."""
 
-    def __init__(self, worker_llm, tools, memory):
+    def __init__(self, worker_llm, tools, memory, response_cache=None):
         self.worker_llm = worker_llm
+        prompt = _CACHE_CONTROL_PROMPT if PROMPT_CACHE_CONTROL else _WORKER_PROMPT
+        self._worker_chain = prompt | worker_llm
         self.tools = tools
         self.memory = memory
+        # Optional SemanticResponseCache; answers are only shared between
+        # graphs bound to the same tool set, and within one run scope
+        # (GraphState.cache_scope: session + active RAG index).
+        self.response_cache = response_cache
+        self._cache_scope = make_cache_scope(getattr(t, "name", "") or "" for t in tools)
+
+    def _cached_prompt_text(self, state: GraphState) -> str | None:
+        """
+        Text used as the semantic cache key, or None when the cache does not
+        apply (disabled, or we are past the first worker step of the turn).
+        """
+        messages = state.get("messages")
+        if self.response_cache is None or not messages:
+            return None
+        if not isinstance(messages[-1], HumanMessage):
+            return None
+        # A summary of older turns is passed as a leading SystemMessage
+        head = messages[0]
+        parts = [head.content] if isinstance(head, SystemMessage) and isinstance(head.content, str) else []
+        parts += [
+            m.content
+            for m in messages[-_CACHE_CONTEXT_MESSAGES * 2:]
+            if isinstance(m, (HumanMessage, AIMessage)) and isinstance(m.content, str)
+        ]
+        return "\n".join(parts) or None
 
     # -------------------- Nodes --------------------
 
-    def worker_node(self, state: SidekickState) -> dict:
+    async def worker_node(self, state: GraphState) -> dict:
         """Worker node: main LLM with tool access."""
 
-        # Build a single string for the system prompt
-        success_criteria = (
-            state.success_criteria
-            if getattr(state, "success_criteria", None)
-            else "Provide a clear, correct answer."
-        )
-
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-        system_content = (
-            "You are a helpful assistant with access to several external tools.\n"
-            "Some tools may be *disabled* depending on user settings. Always use tools only when "
-            "they are clearly helpful and necessary.\n\n"
-            
-            "NOTES:\n"
-            "- If a tool is disabled for this run, do not attempt to call it.\n"
-            "- Use tools sparingly and only when needed to answer the user's question.\n"
-            "- When using the Python tool, always use print() to show results. Bare expressions will not display values.\n"
-            "- Whenever you write mathematical expressions in LaTeX, you MUST always use block delimiters with double dollar signs $$ ... $$"
-            "- In each turn use a tool a maximum of 3 times, if you cannot complete the tasks say so and explain what happened.\n\n"
-        
-            f"Success criteria: {success_criteria}\n"
-            f"Current time: {current_time}\n"
-        )
-
-        system_msg = SystemMessage(content=system_content)
-
-        # Prepend system message to the existing conversation
-        messages = [system_msg] + state.messages
-
-        # Call the bound LLM (worker_llm already has tools bound)
-        response = self.worker_llm.invoke(messages)
+        success_criteria = state.get("success_criteria") or "Provide a clear, correct answer."
+
+        current_time = _now_minute()
+
+        # Semantic cache: reuse a previous direct answer to a near-identical prompt
+        cache_vec = None
+        cache_scope = f"{self._cache_scope}:{state.get('cache_scope') or ''}:{success_criteria}"
+        prompt_text = self._cached_prompt_text(state)
+        if prompt_text is not None:
+            try:
+                # Embedding call is blocking: keep it off the event loop
+                cached, cache_vec = await asyncio.to_thread(
+                    self.response_cache.lookup, cache_scope, prompt_text
+                )
+                if cached is not None:
+                    return {"messages": [AIMessage(content=cached)]}
+            except Exception as e:
+                logger.warning("Response cache lookup failed: %s", e)
+
+        # Prompt template prepends the system message to the conversation;
+        # worker_llm already has tools bound
+        if PROMPT_CACHE_CONTROL:
+            prompt_vars = {
+                "system": [_cache_control_system_message(success_criteria, current_time)],
+                "history": state["messages"],
+            }
+        else:
+            prompt_vars = {
+                "success_criteria": success_criteria,
+                "current_time": current_time,
+                "history": state["messages"],
+            }
+        response = await self._worker_chain.ainvoke(prompt_vars)
+
+        # Only cache answers that needed no tools (tool results may go stale)
+        if (
+            cache_vec is not None
+            and not getattr(response, "tool_calls", None)
+            and isinstance(response.content, str)
+            and response.content
+        ):
+            self.response_cache.store(cache_scope, cache_vec, response.content)
 
         # Return partial state update: add the new assistant message
         return {"messages": [response]}
-    # -------------------- Edge conditions --------------------
-
-    def should_continue(self, state: SidekickState) -> str:
-        """
-        Decide if need to use tools or end
-        """
-        last_message = state.messages[-1]
-        if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-            return "tools"
-        return "end"
 
     # -------------------- Construcción --------------------
 
     async def build(self):
         """Build and compile graph."""
-        graph_builder = StateGraph(SidekickState)
+        graph_builder = StateGraph(GraphState)
 
         # Nodos
         graph_builder.add_node("worker", self.worker_node)
@@ -86,7 +207,7 @@ class GraphBuilder:
         # worker -> tools (si hay tool_calls) o END (si no)
         graph_builder.add_conditional_edges(
             "worker",
-            self.should_continue,
+            route_worker,
             {
                 "tools": "tools",
                 "end": END,
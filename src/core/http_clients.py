@@ -0,0 +1,90 @@
+"""
+Process-wide HTTP clients for the OpenAI-backed models.
+
+The chat model and every embeddings client share one connection pool (sync,
+and async per event loop), so concurrent requests reuse warm keep-alive connections
+instead of each client opening its own TCP+TLS connections.
+"""
+
+import asyncio
+import importlib.util
+import weakref
+from functools import lru_cache
+
+import httpx
+
+# Embedding batches run concurrently (IndexingService.EMBED_CONCURRENCY)
+# next to chat turns: keep enough idle connections for both.
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=64)
+# Same budget as the OpenAI SDK defaults
+_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+# HTTP/2 needs the optional h2 package
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that hands each request to a connection pool owned by
+    the running event loop. Pooled connections are bound to the loop that
+    opened them, so the app's loop and a temporary one (Sidekick.index_path
+    runs under asyncio.run) never share a pool.
+    """
+
+    def __init__(self):
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _loop_pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = httpx.AsyncHTTPTransport(http2=_HTTP2, limits=_LIMITS)
+        return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._loop_pool().handle_async_request(request)
+
+    async def close_loop_pool(self) -> None:
+        """Close the running loop's pool (before a temporary loop ends)."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+    async def aclose(self) -> None:
+        # Pools of loops that already stopped are closed best-effort
+        pools = list(self._pools.values())
+        self._pools.clear()
+        for pool in pools:
+            try:
+                await pool.aclose()
+            except Exception:
+                pass
+
+
+@lru_cache(maxsize=None)
+def _get_async_transport() -> _LoopLocalTransport:
+    return _LoopLocalTransport()
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    return httpx.Client(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=_get_async_transport(), timeout=_TIMEOUT)
+
+
+async def release_loop_http_pool() -> None:
+    """Close the running loop's async connection pool, if it has one."""
+    await _get_async_transport().close_loop_pool()
+
+
+async def close_http_clients() -> None:
+    """Close the shared HTTP clients (app shutdown)."""
+    if get_http_client.cache_info().currsize:
+        get_http_client().close()
+    if get_async_http_client.cache_info().currsize:
+        await get_async_http_client().aclose()
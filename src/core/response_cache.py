@@ -0,0 +1,75 @@
+"""
+Semantic response cache for the worker LLM.
+
+Stores (prompt embedding, answer) pairs and returns a previous answer when a
+new prompt is close enough (cosine similarity) within the same scope.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, Optional, Tuple
+
+import numpy as np
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+
+def make_cache_scope(parts: Iterable[str]) -> str:
+    """Stable scope id (e.g. from the bound tool names)."""
+    return hashlib.blake2b("\x1f".join(sorted(parts)).encode(), digest_size=16).hexdigest()
+
+
+class SemanticResponseCache:
+    """In-memory, bounded semantic cache keyed by scope."""
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries_per_scope: int = 256,
+        max_scopes: int = 64,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+
+        # scope -> deque of (unit vector, answer); scopes kept in LRU order
+        self._entries: "OrderedDict[str, Deque[Tuple[np.ndarray, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, scope: str, text: str) -> Tuple[Optional[str], np.ndarray]:
+        """
+        Return (cached answer or None, query vector). The vector is returned
+        so a miss can be stored without embedding the prompt twice.
+        """
+        vec = self._embed(text)
+        with self._lock:
+            entries = self._entries.get(scope)
+            if not entries:
+                return None, vec
+            self._entries.move_to_end(scope)
+            matrix = np.stack([e[0] for e in entries])
+            sims = matrix @ vec
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                return entries[best][1], vec
+        return None, vec
+
+    def store(self, scope: str, vec: np.ndarray, answer: str) -> None:
+        with self._lock:
+            entries = self._entries.get(scope)
+            if entries is None:
+                entries = self._entries[scope] = deque(maxlen=self.max_entries_per_scope)
+                if len(self._entries) > self.max_scopes:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(scope)
+            entries.append((vec, answer))
@@ -3,51 +3,90 @@ Main Sidekick class.
 Coordinates indexing, retrieval services, and the LangGraph pipeline.
 """
 
+import asyncio
 import gc
-import json
+import itertools
+import logging
 import os
-import time
+import stat
+import threading
 import uuid
-from typing import Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
+from typing import Optional, Tuple
 
+import orjson
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.checkpoint.memory import MemorySaver
 
 from src.core.graph import GraphBuilder
-from src.core.state import SidekickState
+from src.core.http_clients import (
+    get_async_http_client,
+    get_http_client,
+    release_loop_http_pool,
+)
+from src.core.response_cache import SEMANTIC_CACHE_ENABLED, SemanticResponseCache
+from src.core.state import GraphState
+from src.db.index_manifest_repository import IndexManifestRepository
 from src.services.indexing_service import IndexingService
 from src.services.retrieval_service import RetrievalService
 from src.tools import build_all_tools
-from src.utils.path_utils import get_absolute_path, normalize_path, validate_directory
+from src.utils.path_utils import get_absolute_path, normalize_path
 from src.utils.fs_utils import delete_dir_verified
 
 load_dotenv(override=True)
 
 VECTORSTORE_ROOT = os.environ.get("VECTORSTORE_ROOT", "vector_db")
+# Legacy manifest file; its entries are moved into the DB on first start
 INDEX_MANIFEST = os.path.join(VECTORSTORE_ROOT, "index_manifest.json")
 SEARCH_K = 15
 
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.environ.get("EMBEDDING_DIMENSIONS", 512))
+# Indexes whose manifest entry predates the fields above were built with this
+LEGACY_EMBEDDING = ("text-embedding-ada-002", None)
 
-def _is_file(path: str) -> bool:
-    return os.path.isfile(path)
+logger = logging.getLogger("sidekick")
 
 
-def _is_dir(path: str) -> bool:
-    return os.path.isdir(path)
-
-
-def _make_index_key(path: str) -> str:
+def _classify(path: str) -> Tuple[str, Optional[str]]:
     """
+    Resolve a path with a single stat() call.
+    Returns (index_key, kind) where kind is "dir", "file" or None (missing).
     Stable key:
     - directories: absolute path
     - files: FILE::<absolute_path>
     """
     abs_path = get_absolute_path(path)
-    if os.path.isfile(abs_path):
-        return f"FILE::{abs_path}"
-    return abs_path
+    try:
+        mode = os.stat(abs_path).st_mode
+    except OSError:
+        return abs_path, None
+    if stat.S_ISREG(mode):
+        return f"FILE::{abs_path}", "file"
+    if stat.S_ISDIR(mode):
+        return abs_path, "dir"
+    return abs_path, None
+
+
+def _make_index_key(path: str) -> str:
+    return _classify(path)[0]
+
+
+def _entry_persist_dir(entry) -> str:
+    """Manifest entries are {persist_dir, chunk params, files}; older ones are a bare path."""
+    return entry["persist_dir"] if isinstance(entry, dict) else entry
+
+
+# Messages dumped to the debug log after a run (the tail is this turn)
+DEBUG_TAIL_MESSAGES = 8
+
+# Role labels used when flattening messages into a plain-text transcript
+_TRANSCRIPT_ROLES = {"human": "User", "ai": "Assistant"}
 
 
 class Sidekick:
@@ -59,70 +98,168 @@ class Sidekick:
             model="gpt-4o-mini",
             openai_api_key=api_key,
             temperature=0,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
         )
 
-        embeddings = OpenAIEmbeddings(openai_api_key=api_key)
-        self.indexing_service = IndexingService(embeddings, VECTORSTORE_ROOT)
+        self._api_key = api_key
+        # (model, dimensions) -> OpenAIEmbeddings; indexes built with an older
+        # model keep being queried with that model
+        self._embeddings_by_config: dict = {}
+        # indexing_service (and its embeddings client) is created on first use
         self.retrieval_service = RetrievalService()
 
+        # Opt-in (SEMANTIC_CACHE_ENABLED=1): costs one embedding call per turn
+        self.response_cache = (
+            SemanticResponseCache(self._embeddings_for(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS))
+            if SEMANTIC_CACHE_ENABLED
+            else None
+        )
+
         self.memory = MemorySaver()
+        # Checkpointer thread ids: sidekick_id + run counter (unique within
+        # the process, which is all an in-memory checkpointer needs)
+        self._run_counter = itertools.count()
         self.graph = None
+        # frozenset of tool ids -> compiled graph
+        self._graph_cache: dict = {}
 
         self.all_tools = []
         self.tools = []
+        self._tool_positions_by_tag: dict[str, list[int]] = {}
+        self._tool_position_by_name: dict[str, int] = {}
+        # id(tool) -> OpenAI tool schema, generated once per tool
+        self._tool_schemas: dict[int, dict] = {}
+
+        # One lock per index key: concurrent index/remove calls on the same
+        # path run one at a time (a duplicate index request then finds the
+        # index already registered instead of embedding it twice).
+        self._index_locks: dict[str, asyncio.Lock] = {}
+
+        # Parsed once; kept in sync with the file on every mutation
+        self._manifest = self._load_index_manifest()
+        self._manifest_lock = threading.Lock()
 
         self._bootstrap_retrievers_from_manifest()
 
-    # ---------- Manifest ----------
+    @cached_property
+    def indexing_service(self) -> IndexingService:
+        """Built lazily: sessions that never index skip the embeddings client."""
+        return IndexingService(
+            self._embeddings_for(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS), VECTORSTORE_ROOT
+        )
 
-    def _load_index_manifest(self) -> dict:
-        if not os.path.exists(VECTORSTORE_ROOT):
-            os.makedirs(VECTORSTORE_ROOT, exist_ok=True)
+    # ---------- Embeddings ----------
+
+    def _embeddings_for(self, model: str, dimensions: Optional[int]) -> OpenAIEmbeddings:
+        key = (model, dimensions)
+        embeddings = self._embeddings_by_config.get(key)
+        if embeddings is None:
+            # chunk_size = texts per embeddings request (not text splitting)
+            embeddings = OpenAIEmbeddings(
+                model=model,
+                dimensions=dimensions,
+                openai_api_key=self._api_key,
+                chunk_size=512,
+                max_retries=5,
+                http_client=get_http_client(),
+                http_async_client=get_async_http_client(),
+            )
+            self._embeddings_by_config[key] = embeddings
+        return embeddings
 
-        if not os.path.exists(INDEX_MANIFEST):
-            return {}
+    def _entry_embeddings(self, entry) -> OpenAIEmbeddings:
+        """Embeddings an index was built with (legacy entries: the old default model)."""
+        if isinstance(entry, dict) and "embedding_model" in entry:
+            return self._embeddings_for(entry["embedding_model"], entry.get("embedding_dimensions"))
+        return self._embeddings_for(*LEGACY_EMBEDDING)
 
-        try:
-            with open(INDEX_MANIFEST, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data if isinstance(data, dict) else {}
-        except Exception as e:
-            print(f"[WARN] Could not load index manifest: {e}")
-            return {}
+    # ---------- Manifest ----------
 
-    def _save_index_manifest(self, manifest: dict) -> None:
+    def _load_index_manifest(self) -> dict:
         os.makedirs(VECTORSTORE_ROOT, exist_ok=True)
+        manifest = IndexManifestRepository.load_all()
+        if not manifest and os.path.exists(INDEX_MANIFEST):
+            manifest = self._migrate_json_manifest()
+        return manifest
+
+    def _migrate_json_manifest(self) -> dict:
+        """Move entries of the legacy index_manifest.json into the DB."""
         try:
-            with open(INDEX_MANIFEST, "w", encoding="utf-8") as f:
-                json.dump(manifest, f, indent=2)
+            with open(INDEX_MANIFEST, "rb") as f:
+                data = orjson.loads(f.read())
         except Exception as e:
-            print(f"[WARN] Could not save index manifest: {e}")
+            logger.warning("Could not load index manifest: %s", e)
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        # Legacy entries were a bare persist dir
+        manifest = {
+            k: v if isinstance(v, dict) else {"persist_dir": v} for k, v in data.items()
+        }
+        if IndexManifestRepository.save_many(manifest):
+            os.replace(INDEX_MANIFEST, f"{INDEX_MANIFEST}.migrated")
+            logger.info("Migrated %d index manifest entries to the database", len(manifest))
+        return manifest
+
+    def _set_manifest_entry(self, index_key: str, entry: dict) -> None:
+        with self._manifest_lock:
+            self._manifest[index_key] = entry
+            IndexManifestRepository.save(index_key, entry)
+
+    def _drop_manifest_entry(self, index_key: str) -> None:
+        with self._manifest_lock:
+            if self._manifest.pop(index_key, None) is not None:
+                IndexManifestRepository.delete(index_key)
 
     def _bootstrap_retrievers_from_manifest(self):
-        manifest = self._load_index_manifest()
+        manifest = self._manifest
         if not manifest:
-            print("[INFO] No existing indexes found in manifest.")
+            logger.info("No existing indexes found in manifest.")
             return
 
-        print(f"[INFO] Bootstrapping {len(manifest)} indexes from manifest...")
-
-        for index_key, persist_dir in manifest.items():
-            try:
-                vectorstore = self.indexing_service.load_vectorstore(persist_dir)
-                if not vectorstore:
-                    print(f"[WARN] Could not load vectorstore at {persist_dir}")
-                    continue
-
-                retriever = vectorstore.as_retriever(search_kwargs={"k": SEARCH_K})
-                self.retrieval_service.register_retriever(
+        logger.info("Bootstrapping %d indexes from manifest...", len(manifest))
+
+        # Opening a Chroma store is mostly file/SQLite I/O: load them in
+        # parallel, then register from this thread as each one completes.
+        # (The lazy indexing service is created here, before the workers.)
+        self.indexing_service
+        with ThreadPoolExecutor(max_workers=min(8, len(manifest))) as pool:
+            futures = {
+                pool.submit(
+                    self._load_index, _entry_persist_dir(entry), self._entry_embeddings(entry)
+                ): (
                     index_key,
-                    retriever,
-                    persist_dir,
-                    vectorstore=vectorstore,
+                    _entry_persist_dir(entry),
                 )
-                print(f"[OK] Restored retriever for {index_key} from {persist_dir}")
-            except Exception as e:
-                print(f"[ERROR] Failed to restore index for {index_key}: {e}")
+                for index_key, entry in manifest.items()
+            }
+            for future in as_completed(futures):
+                index_key, persist_dir = futures[future]
+                try:
+                    loaded = future.result()
+                    if loaded is None:
+                        logger.warning("Could not load vectorstore at %s", persist_dir)
+                        continue
+
+                    vectorstore, retriever = loaded
+                    self.retrieval_service.register_retriever(
+                        index_key,
+                        retriever,
+                        persist_dir,
+                        vectorstore=vectorstore,
+                    )
+                    logger.info("Restored retriever for %s from %s", index_key, persist_dir)
+                except Exception as e:
+                    logger.error("Failed to restore index for %s: %s", index_key, e)
+
+    def _load_index(self, persist_dir: str, embeddings: OpenAIEmbeddings):
+        """Open a persisted index. Returns (vectorstore, retriever) or None."""
+        vectorstore = self.indexing_service.load_vectorstore(persist_dir, embeddings)
+        if not vectorstore:
+            return None
+        parents = self.indexing_service.load_parents(persist_dir)
+        return vectorstore, self.indexing_service.make_retriever(vectorstore, parents, SEARCH_K)
 
     # ---------- Chroma handle release (critical on Windows) ----------
 
@@ -143,7 +280,7 @@ class Sidekick:
             if system is not None and hasattr(system, "stop"):
                 system.stop()
         except Exception as e:
-            print("[DEBUG] close_vectorstore: client/system stop failed:", e)
+            logger.debug("close_vectorstore: client/system stop failed: %s", e)
 
         # Drop references (most important part)
         try:
@@ -151,47 +288,102 @@ class Sidekick:
         except Exception:
             pass
 
-        gc.collect()
-        time.sleep(0.35)
+        # Only Windows refuses to delete files that still have open handles;
+        # collect cycles there so they are released before the delete, which
+        # retries on its own if a handle lingers.
+        if os.name == "nt":
+            gc.collect()
 
     # -------------------- Setup --------------------
 
-    async def _build_graph_with_tools(self, tools):
-        worker_llm_with_tools = self.worker_llm.bind_tools(tools)
+    async def _compile_graph(self, tools):
+        # Pre-converted schemas: every graph binds the same per-tool JSON
+        worker_llm_with_tools = self.worker_llm.bind_tools(
+            [self._tool_schemas.get(id(t), t) for t in tools]
+        )
         graph_builder = GraphBuilder(
             worker_llm=worker_llm_with_tools,
             tools=tools,
             memory=self.memory,
+            response_cache=self.response_cache,
         )
-        self.graph = await graph_builder.build()
+        return await graph_builder.build()
+
+    async def _get_graph(self, tools):
+        """Compiled graph for this exact tool set (built once, then cached)."""
+        key = frozenset(id(t) for t in tools)
+        graph = self._graph_cache.get(key)
+        if graph is None:
+            logger.info("Building graph for tools: %s", [getattr(t, "name", None) for t in tools])
+            graph = await self._compile_graph(tools)
+            self._graph_cache[key] = graph
+        return graph
+
+    async def _build_graph_with_tools(self, tools):
+        self.graph = await self._get_graph(tools)
         self.tools = tools
 
+    def _select_tools(self, enabled_tools: Optional[list[str]]) -> list:
+        """Tools whose tag or name is among the enabled groups (all if None)."""
+        if enabled_tools is None:
+            return self.all_tools
+        positions = set()
+        for group in enabled_tools:
+            positions.update(self._tool_positions_by_tag.get(group, ()))
+            position = self._tool_position_by_name.get(group)
+            if position is not None:
+                positions.add(position)
+        # Keep the original tool order
+        return [self.all_tools[i] for i in sorted(positions)]
+
+    def _index_tools(self) -> None:
+        """
+        Tag -> tool positions and name -> position, for O(k) tool selection,
+        plus each tool's function-calling schema.
+        """
+        self._tool_positions_by_tag = defaultdict(list)
+        self._tool_position_by_name = {}
+        self._tool_schemas = {}
+        for i, t in enumerate(self.all_tools):
+            try:
+                self._tool_schemas[id(t)] = convert_to_openai_tool(t)
+            except Exception as e:
+                # bind_tools converts it itself
+                logger.warning("Could not pre-convert tool %s: %s", getattr(t, "name", t), e)
+            for tag in getattr(t, "tags", None) or []:
+                self._tool_positions_by_tag[tag].append(i)
+            name = getattr(t, "name", None)
+            if name is not None:
+                self._tool_position_by_name.setdefault(name, i)
+
     async def setup(self):
         self.all_tools = build_all_tools(self.retrieval_service)
+        self._index_tools()
+        self._graph_cache.clear()
+
+        # Pre-build one graph per combination of tool groups, so toggling
+        # groups in the UI never compiles a graph on the request path
+        groups = sorted(self._tool_positions_by_tag)
+        for r in range(len(groups) + 1):
+            for combo in itertools.combinations(groups, r):
+                await self._get_graph(self._select_tools(list(combo)))
+
         await self._build_graph_with_tools(self.all_tools)
 
     # -------------------- Indexing --------------------
 
-    def index_path(
+    def _prepare_index(
         self,
         path: str,
-        force_reindex: bool = False,
-        chunk_size: int = 600,
-        chunk_overlap: int = 20,
-        recursive: bool = True,
-    ) -> str:
-        path = normalize_path(path)
-
-        if _is_dir(path):
-            if not validate_directory(path):
-                return f"[ERROR] Invalid directory: {path}"
-        elif _is_file(path):
-            pass
-        else:
-            return f"[ERROR] Invalid path (not found): {path}"
-
-        index_key = _make_index_key(path)
-
+        index_key: str,
+        force_reindex: bool,
+        recursive: bool,
+    ):
+        """
+        Blocking part of indexing: drop the old index if forced and list the
+        files to index (the path is already known to exist).
+        Returns the list of files, or an error/info message.
+        """
         if self.retrieval_service.has_retriever(index_key) and not force_reindex:
             return f"[INFO] Already indexed: {path}"
 
@@ -203,27 +395,151 @@ class Sidekick:
             if old_persist:
                 self.indexing_service.remove_vectorstore(old_persist)
 
-        docs = self.indexing_service.load_documents(path, recursive=recursive)
-        if not docs:
+        files = self.indexing_service.list_files(path, recursive=recursive)
+        if not files:
             return "❌ No readable documents found"
-
+        return files
+
+    def _prepare_changed_files(self, paths: list, chunk_size: int, chunk_overlap: int):
+        """Load and split only the given files. Returns (chunks, parents)."""
+        parents: dict = {}
+        if not paths:
+            return [], parents
+        docs = self.indexing_service.load_documents_from_paths(paths)
         valid_docs = self.indexing_service.normalize_document_metadata(docs)
+        chunks = self.indexing_service.chunk_documents(
+            valid_docs,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            parents=parents,
+        )
+        return chunks, parents
 
-        try:
-            chunks = self.indexing_service.chunk_documents(
-                valid_docs,
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
+    async def _reindex_incremental(
+        self,
+        path: str,
+        index_key: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        recursive: bool,
+    ) -> Optional[str]:
+        """
+        Re-embed only the files that changed since the last index.
+        Returns None when the existing index cannot be updated in place
+        (unknown files, different chunk parameters, legacy flat index), in
+        which case the caller rebuilds it from scratch.
+        """
+        entry = self._manifest.get(index_key)
+        vectorstore = self.retrieval_service.vectorstores.get(index_key)
+        retriever = self.retrieval_service.retriever_registry.get(index_key)
+        parents = getattr(retriever, "parents", None)
+        if (
+            not isinstance(entry, dict)
+            or "files" not in entry
+            or vectorstore is None
+            or parents is None
+            or (entry.get("chunk_size"), entry.get("chunk_overlap")) != (chunk_size, chunk_overlap)
+            # New vectors must live in the same embedding space as the old ones
+            or (entry.get("embedding_model"), entry.get("embedding_dimensions"))
+            != (EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+        ):
+            return None
+
+        known = entry["files"]
+        current, changed, removed = await asyncio.to_thread(
+            self.indexing_service.diff_files, path, known, recursive
+        )
+        if not changed and not removed:
+            return f"[INFO] No changes since last index: {path}"
+
+        chunks, new_parents = await asyncio.to_thread(
+            self._prepare_changed_files, changed, chunk_size, chunk_overlap
+        )
+        await self.indexing_service.add_chunks_async(vectorstore, chunks)
+
+        # Drop what the changed/removed files contributed before
+        stale = [known[p] for p in changed + removed if p in known]
+        stale_ids = [cid for record in stale for cid in record.get("chunk_ids", [])]
+        await asyncio.to_thread(self.indexing_service.delete_chunks, vectorstore, stale_ids)
+        for record in stale:
+            for parent_id in record.get("parent_ids", []):
+                parents.pop(parent_id, None)
+        parents.update(new_parents)
+
+        persist_dir = entry["persist_dir"]
+        await asyncio.to_thread(self.indexing_service.save_parents, persist_dir, parents)
+
+        # Unchanged files keep their chunk ids; refresh their stat fields so a
+        # touched-but-identical file is not re-hashed next time
+        files = {p: {**known[p], **current[p]} for p in current if p not in changed}
+        files.update(
+            self.indexing_service.file_records({p: current[p] for p in changed}, chunks)
+        )
+        self._set_manifest_entry(index_key, {**entry, "files": files})
+
+        return (
+            f"✅ Reindexed {len(changed)} changed files ({len(chunks)} chunks), "
+            f"removed {len(removed)} files"
+        )
+
+    async def index_path_async(
+        self,
+        path: str,
+        force_reindex: bool = False,
+        chunk_size: int = 200,
+        chunk_overlap: int = 20,
+        recursive: bool = True,
+    ) -> str:
+        path = normalize_path(path)
+        index_key, kind = _classify(path)
+        if kind is None:
+            return f"[ERROR] Invalid path (not found): {path}"
+
+        async with self._index_locks.setdefault(index_key, asyncio.Lock()):
+            return await self._index_path_locked(
+                path, index_key, force_reindex, chunk_size, chunk_overlap, recursive
             )
-        except Exception as e:
-            return f"[ERROR] Error during chunk splitting: {e}"
 
-        vectorstore, persist_dir = self.indexing_service.create_vectorstore(chunks, directory_name=path)
-        if not vectorstore or not persist_dir:
+    async def _index_path_locked(
+        self,
+        path: str,
+        index_key: str,
+        force_reindex: bool,
+        chunk_size: int,
+        chunk_overlap: int,
+        recursive: bool,
+    ) -> str:
+        # Reindexing with unchanged chunk parameters only re-embeds changed files
+        if force_reindex:
+            try:
+                result = await self._reindex_incremental(
+                    path, index_key, chunk_size, chunk_overlap, recursive
+                )
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.warning("Incremental reindex failed, rebuilding: %s", e)
+
+        files = await asyncio.to_thread(
+            self._prepare_index, path, index_key, force_reindex, recursive
+        )
+        if isinstance(files, str):
+            return files
+
+        # Loading/splitting of later files overlaps embedding of earlier ones
+        built = await self.indexing_service.index_files_async(
+            files, directory_name=path, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        if built is None:
             return "[ERROR] Failed to create vectorstore"
+        vectorstore, persist_dir, parents, files, n_chunks, n_docs = built
+        if not n_docs:
+            self._close_vectorstore_best_effort(vectorstore)
+            await asyncio.to_thread(self.indexing_service.remove_vectorstore, persist_dir)
+            return "❌ No readable documents found"
 
         try:
-            retriever = vectorstore.as_retriever(search_kwargs={"k": SEARCH_K})
+            retriever = self.indexing_service.make_retriever(vectorstore, parents, SEARCH_K)
             self.retrieval_service.register_retriever(
                 index_key,
                 retriever,
@@ -231,24 +547,58 @@ class Sidekick:
                 vectorstore=vectorstore,
             )
 
-            manifest = self._load_index_manifest()
-            manifest[index_key] = persist_dir
-            self._save_index_manifest(manifest)
+            self._set_manifest_entry(
+                index_key,
+                {
+                    "persist_dir": persist_dir,
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "embedding_model": EMBEDDING_MODEL,
+                    "embedding_dimensions": EMBEDDING_DIMENSIONS,
+                    "files": files,
+                },
+            )
 
         except Exception as e:
             return f"❌ Failed to register retriever: {e}"
 
-        return f"✅ Indexed {len(chunks)} chunks from {len(valid_docs)} documents"
+        return f"✅ Indexed {n_chunks} chunks from {n_docs} documents"
+
+    def index_path(
+        self,
+        path: str,
+        force_reindex: bool = False,
+        chunk_size: int = 200,
+        chunk_overlap: int = 20,
+        recursive: bool = True,
+    ) -> str:
+        """Synchronous wrapper around index_path_async (not for use inside a running loop)."""
+
+        async def index_and_release() -> str:
+            try:
+                return await self.index_path_async(
+                    path, force_reindex, chunk_size, chunk_overlap, recursive
+                )
+            finally:
+                # The loop ends with asyncio.run: close the HTTP pool it opened
+                await release_loop_http_pool()
+
+        return asyncio.run(index_and_release())
+
+    async def remove_path_async(self, path: str) -> str:
+        """remove_path() in a worker thread, serialized with indexing of the same path."""
+        path = normalize_path(path)
+        async with self._index_locks.setdefault(_make_index_key(path), asyncio.Lock()):
+            return await asyncio.to_thread(self.remove_path, path)
 
     def remove_path(self, path: str) -> str:
 
         path = normalize_path(path)
 
-        if not (_is_dir(path) or _is_file(path)):
+        index_key, kind = _classify(path)
+        if kind is None:
             return f"[ERROR] Invalid path (not found): {path}"
 
-        index_key = _make_index_key(path)
-
         # 1) Pop vectorstore object AND unregister retriever (drop retriever refs first)
         vs = self.retrieval_service.pop_vectorstore(index_key)
         persist_dir = self.retrieval_service.unregister_retriever(index_key)
@@ -270,16 +620,12 @@ class Sidekick:
                 debug=False,
             )
 
-        manifest = self._load_index_manifest()
-
         if persist_dir:
             persist_abs = os.path.abspath(persist_dir)
             persist_gone = not os.path.exists(persist_abs)
 
             if deleted_ok and persist_gone:
-                if index_key in manifest:
-                    manifest.pop(index_key, None)
-                    self._save_index_manifest(manifest)
+                self._drop_manifest_entry(index_key)
                 return f"🗑️ Removed index: {path}"
 
             
@@ -291,9 +637,7 @@ class Sidekick:
             )
 
         # If persist_dir is None (stale registry), remove manifest entry if present
-        if index_key in manifest:
-            manifest.pop(index_key, None)
-            self._save_index_manifest(manifest)
+        self._drop_manifest_entry(index_key)
 
         return f"🗑️ Removed index (no persist dir found): {path}"
 
@@ -303,7 +647,7 @@ class Sidekick:
         self,
         directory: str,
         force_reindex: bool = False,
-        chunk_size: int = 600,
+        chunk_size: int = 200,
         chunk_overlap: int = 20,
     ) -> str:
         return self.index_path(
@@ -326,29 +670,22 @@ class Sidekick:
         top_k: Optional[int] = None,
         enabled_tools: Optional[list[str]] = None,
         history: Optional[list[BaseMessage]] = None,
+        session_id: Optional[str] = None,
     ) -> str:
         if not self.graph or not getattr(self, "all_tools", None):
             await self.setup()
 
-        if enabled_tools is None:
-            tools_to_use = self.all_tools
-        else:
-            enabled_groups = set(enabled_tools)
-            tools_to_use = []
-            for t in self.all_tools:
-                tags = getattr(t, "tags", []) or []
-                name = getattr(t, "name", None)
-                if enabled_groups.intersection(tags) or name in enabled_groups:
-                    tools_to_use.append(t)
-
-        if set(id(t) for t in tools_to_use) != set(id(t) for t in self.tools):
-            print(">>> Rebuilding graph for tools:", [getattr(t, "name", None) for t in tools_to_use])
-            await self._build_graph_with_tools(tools_to_use)
-
-        print(f"User input: {user_input!r}")
-        print(f"Folder passed in: {folder!r}")
-        print(f"Enabled tool groups: {enabled_tools}")
-        print("Tools in graph:", [getattr(t, "name", None) for t in self.tools])
+        tools_to_use = self._select_tools(enabled_tools)
+        # Local reference: concurrent runs may select different graphs
+        graph = await self._get_graph(tools_to_use)
+        self.graph, self.tools = graph, tools_to_use
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("User input: %r", user_input)
+            logger.debug("Folder passed in: %r", folder)
+            logger.debug("Enabled tool groups: %s", enabled_tools)
+            logger.debug("Tools in graph: %s", [getattr(t, "name", None) for t in tools_to_use])
 
         rag_enabled = True if enabled_tools is None else ("rag" in enabled_tools)
 
@@ -356,20 +693,22 @@ class Sidekick:
             folder_norm = normalize_path(folder)
             index_key = _make_index_key(folder_norm)
             self.retrieval_service.set_current_folder(index_key)
-            print(f">>> Active RAG index set to: {index_key}")
+            logger.debug("Active RAG index set to: %s", index_key)
         else:
             self.retrieval_service.set_current_folder(None)
-            print(">>> Active RAG folder set to: NONE (RAG disabled or no folder)")
+            logger.debug("Active RAG folder set to: NONE (RAG disabled or no folder)")
 
         if top_k is not None and top_k > 0:
-            print(f">>> Setting retrieval default_k to: {top_k}")
+            logger.debug("Setting retrieval default_k to: %s", top_k)
             self.retrieval_service.default_k = top_k
 
-        active_retriever = self.retrieval_service.get_retriever(self.retrieval_service.current_folder)
-        print(f">>> Retriever selected: {active_retriever}")
-        print("=========================================\n")
+        if debug:
+            logger.debug(
+                "Retriever selected: %s",
+                self.retrieval_service.get_retriever(self.retrieval_service.current_folder),
+            )
 
-        thread_id = str(uuid.uuid4())
+        thread_id = f"{self.sidekick_id}-{next(self._run_counter)}"
         config = {"configurable": {"thread_id": thread_id, "enabled_tools": enabled_tools}}
 
         if history is not None and len(history) > 0:
@@ -377,31 +716,79 @@ class Sidekick:
         else:
             messages = [HumanMessage(content=user_input)]
 
-        initial_state = SidekickState(messages=messages, success_criteria="Answer fully")
-        result = await self.graph.ainvoke(initial_state, config)
-
-        print("\n======= LANGGRAPH OUTPUT MESSAGES =======")
-        for i, msg in enumerate(result["messages"]):
-            print(f"[{i}] {type(msg).__name__}: {getattr(msg, 'content', None)!r}")
-        print("=========================================\n")
-
+        initial_state: GraphState = {
+            "messages": messages,
+            "success_criteria": "Answer fully",
+            # Cached answers are never shared across sessions or RAG indexes
+            "cache_scope": f"{session_id or thread_id}:{self.retrieval_service.current_folder or ''}",
+        }
+        try:
+            result = await graph.ainvoke(initial_state, config)
+        finally:
+            # Every run gets a fresh thread_id and the history is passed in
+            # explicitly, so the checkpoint is never read again: drop it
+            # instead of letting the checkpointer grow for the process lifetime.
+            try:
+                await self.memory.adelete_thread(thread_id)
+            except Exception as e:
+                logger.warning("Could not drop checkpoint for thread %s: %s", thread_id, e)
+
+        # Dumping messages is only worth its formatting cost when observed;
+        # the tail is enough to follow this turn
+        if debug:
+            result_messages = result["messages"]
+            start = max(0, len(result_messages) - DEBUG_TAIL_MESSAGES)
+            for i in range(start, len(result_messages)):
+                msg = result_messages[i]
+                logger.debug("[%d] %s: %r", i, type(msg).__name__, getattr(msg, "content", None))
+
+        # The answer is at (or next to) the tail: stop at the first match
         for msg in reversed(result["messages"]):
-            if isinstance(msg, AIMessage) and not msg.content.startswith("💭"):
-                return msg.content
+            if not isinstance(msg, AIMessage):
+                continue
+            content = msg.content
+            if content and isinstance(content, str) and not content.startswith("💭"):
+                return content
 
         return "No response generated"
 
+    async def summarize(self, previous_summary: Optional[str], messages: list[BaseMessage]) -> str:
+        """
+        Fold `messages` into a running conversation summary (no tools bound).
+        Used to keep older turns available without resending them every turn.
+        """
+        transcript = "\n".join(
+            f"{_TRANSCRIPT_ROLES.get(m.type, 'Assistant')}: {m.content}"
+            for m in messages
+            if isinstance(m.content, str)
+        )
+        prompt = (
+            "Update the running summary of a conversation between a user and an assistant. "
+            "Keep facts, decisions, names and open questions; be concise (max ~200 words).\n\n"
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            "Updated summary:"
+        )
+        response = await self.worker_llm.ainvoke([HumanMessage(content=prompt)])
+        return response.content if isinstance(response.content, str) else str(response.content)
+
     def cleanup(self):
         # Best-effort release of all vectorstores first
         for k in list(getattr(self.retrieval_service, "vectorstores", {}).keys()):
             vs = self.retrieval_service.pop_vectorstore(k)
             self._close_vectorstore_best_effort(vs)
 
-        for persist_dir in self.retrieval_service.vectorstore_paths.values():
-            self.indexing_service.remove_vectorstore(persist_dir)
+        # Persist dirs are disjoint, so they can be deleted concurrently
+        persist_dirs = list(self.retrieval_service.vectorstore_paths.values())
+        if persist_dirs:
+            with ThreadPoolExecutor(max_workers=min(8, len(persist_dirs))) as pool:
+                list(pool.map(self.indexing_service.remove_vectorstore, persist_dirs))
 
         self.retrieval_service.clear()
-        print("🧹 Resources cleaned")
+        # Only shut down an indexing service that was actually created
+        if "indexing_service" in self.__dict__:
+            self.indexing_service.shutdown()
+        logger.info("Resources cleaned")
 
 
 async def init_sidekick() -> Sidekick:
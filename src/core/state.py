@@ -1,14 +1,27 @@
 import uuid
-from typing import List, Any, Optional, Dict
-from pydantic import BaseModel, Field
+from typing import List, Any, Optional, Dict, TypedDict
+from pydantic import BaseModel, Field, PrivateAttr
 from langgraph.graph.message import add_messages
 from typing import Annotated
 
+
+class GraphState(TypedDict, total=False):
+    """
+    State passed through the LangGraph nodes. A plain TypedDict, so node
+    updates skip pydantic validation/copies; SidekickState below is the
+    persisted per-session state.
+    """
+
+    messages: Annotated[List[Any], add_messages]
+    success_criteria: Optional[str]
+    # Response cache partition for this run (session + active RAG index)
+    cache_scope: Optional[str]
+
 class SidekickState(BaseModel):
 
     messages: Annotated[List[Any], add_messages] = Field(default_factory=list)
 
-    thread_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    thread_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
 
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     success_criteria: Optional[str] = None
@@ -20,6 +33,42 @@ class SidekickState(BaseModel):
     criteria_met: bool = False
     needs_user_input: bool = False
 
+    # Number of messages already stored in the DB (used for incremental saves)
+    _persisted_len: int = PrivateAttr(default=0)
+
+    # Gradio-formatted history for messages[:_rendered_len] (UI render cache)
+    _rendered_history: List[dict] = PrivateAttr(default_factory=list)
+    _rendered_len: int = PrivateAttr(default=0)
+
+    # Set mirror of indexed_directories for O(1) membership checks
+    _indexed_set: Optional[set] = PrivateAttr(default=None)
+
+    def _indexed_lookup(self) -> set:
+        if self._indexed_set is None or len(self._indexed_set) != len(self.indexed_directories):
+            self._indexed_set = set(self.indexed_directories)
+        return self._indexed_set
+
+    def has_indexed_directory(self, path: str) -> bool:
+        return path in self._indexed_lookup()
+
+    def add_indexed_directory(self, path: str) -> bool:
+        """Append path if missing (keeps list order). Returns True if added."""
+        lookup = self._indexed_lookup()
+        if path in lookup:
+            return False
+        self.indexed_directories.append(path)
+        lookup.add(path)
+        return True
+
+    def remove_indexed_directory(self, path: str) -> bool:
+        """Remove path if present. Returns True if removed."""
+        lookup = self._indexed_lookup()
+        if path not in lookup:
+            return False
+        self.indexed_directories.remove(path)
+        lookup.discard(path)
+        return True
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -2,8 +2,40 @@ import sqlite3
 from pathlib import Path
 from typing import List
 
+import aiosqlite
+
 DB_PATH = Path("database.db")
 
+# Bump when init_db() changes the schema; stored in PRAGMA user_version.
+SCHEMA_VERSION = 3
+
+# Prepared statements kept per connection (sqlite3 default is 128); the
+# repositories use module-level SQL constants, so every call hits the cache.
+_CACHED_STATEMENTS = 256
+
+# Per-connection tuning. These settings are not persisted in the DB file,
+# so they must be applied to every new connection.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA mmap_size = 10737418240;",
+    "PRAGMA cache_size = -65536;",
+    "PRAGMA busy_timeout = 5000;",
+)
+
+
+def is_memory_db() -> bool:
+    return str(DB_PATH) == ":memory:"
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    """Apply per-connection PRAGMAs (skipped for in-memory databases)."""
+    if is_memory_db():
+        return
+    cur = conn.cursor()
+    for pragma in _CONNECTION_PRAGMAS:
+        cur.execute(pragma)
+
 
 def get_conn() -> sqlite3.Connection:
     """
@@ -12,7 +44,23 @@ def get_conn() -> sqlite3.Connection:
     check_same_thread=False allows reuse of the same connection across
     different threads (useful for Gradio / async contexts).
     """
-    return sqlite3.connect(str(DB_PATH), check_same_thread=False)
+    conn = sqlite3.connect(
+        str(DB_PATH), check_same_thread=False, cached_statements=_CACHED_STATEMENTS
+    )
+    _apply_pragmas(conn)
+    return conn
+
+
+async def get_async_conn() -> aiosqlite.Connection:
+    """
+    Returns an aiosqlite connection to the app database, with the same
+    per-connection PRAGMAs as get_conn().
+    """
+    conn = await aiosqlite.connect(str(DB_PATH), cached_statements=_CACHED_STATEMENTS)
+    if not is_memory_db():
+        for pragma in _CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+    return conn
 
 
 def _table_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
@@ -35,6 +83,9 @@ def init_db() -> None:
       - users:   auth info
       - folders: folders registered per user
       - sessions: serialized SidekickState per (username, folder)
+      - messages: chat messages per (username, folder), appended incrementally
+      - embedding_cache: chunk embeddings by (model, dimensions, content hash)
+      - index_manifest: one row per index (persist dir, chunk params, files)
 
     The sessions table is compatible with the SessionRepository / SessionService
     you showed earlier, which save/load by (username, folder).
@@ -42,9 +93,22 @@ def init_db() -> None:
     conn = get_conn()
     cur = conn.cursor()
 
+    # Schema already set up by a previous run/worker: nothing to do
+    # (journal_mode=WAL is persistent, so it is covered too).
+    cur.execute("PRAGMA user_version;")
+    if cur.fetchone()[0] >= SCHEMA_VERSION:
+        conn.close()
+        return
+
     # Always enforce foreign key constraints in SQLite
     cur.execute("PRAGMA foreign_keys = ON;")
 
+    # WAL lets readers proceed while a writer commits and avoids an fsync
+    # per commit (with synchronous=NORMAL). Journal mode is persistent in
+    # the DB file, so setting it once here is enough.
+    if not is_memory_db():
+        cur.execute("PRAGMA journal_mode = WAL;")
+
     # ---------- users table ----------
     cur.execute(
         """
@@ -68,6 +132,14 @@ def init_db() -> None:
         """
     )
 
+    # users(username), sessions(username, folder) and folders(username, folder_path)
+    # are already indexed through their PRIMARY KEY / UNIQUE constraints.
+    # This one serves the per-user folder listing (ordered by id) straight
+    # from the index, without a rowid lookup or a temp B-tree sort.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_folders_username ON folders(username, id, folder_path);"
+    )
+
     # ---------- sessions table ----------
     # We want: username + folder as composite primary key + JSON data
     #
@@ -111,5 +183,52 @@ def init_db() -> None:
         # Already in the correct format
         print("[DB] sessions table already up to date.")
 
+    # ---------- messages table ----------
+    # One row per chat message so each turn only appends the new messages
+    # instead of rewriting the whole conversation in sessions.data.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            username   TEXT NOT NULL,
+            folder     TEXT NOT NULL,
+            seq        INTEGER NOT NULL,
+            type       TEXT NOT NULL,
+            content    TEXT NOT NULL,
+            tool_calls BLOB,
+            PRIMARY KEY (username, folder, seq),
+            FOREIGN KEY (username) REFERENCES users(username) ON DELETE CASCADE
+        );
+        """
+    )
+
+    # ---------- embedding_cache table ----------
+    # Vectors (float32 blobs) of chunk texts already embedded, so rebuilding
+    # an index does not pay the embeddings API again for unchanged text.
+    # dimensions is 0 when the model's native size is used.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model      TEXT NOT NULL,
+            dimensions INTEGER NOT NULL,
+            hash       BLOB NOT NULL,
+            vector     BLOB NOT NULL,
+            PRIMARY KEY (model, dimensions, hash)
+        );
+        """
+    )
+
+    # ---------- index_manifest table ----------
+    # One orjson-encoded entry per index key, so indexing or removing a
+    # folder rewrites only its own row.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS index_manifest (
+            index_key TEXT PRIMARY KEY,
+            entry     BLOB NOT NULL
+        );
+        """
+    )
+
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
     conn.commit()
     conn.close()
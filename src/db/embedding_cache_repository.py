@@ -0,0 +1,64 @@
+"""
+Repository for the embeddings cache
+"""
+from array import array
+from typing import Dict, List
+
+from src.db.pool import get_pool
+
+# Keys per SELECT, well under SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+_SELECT_VECTORS_SQL = (
+    "SELECT hash, vector FROM embedding_cache "
+    "WHERE model = ? AND dimensions = ? AND hash IN ({placeholders})"
+)
+_INSERT_VECTOR_SQL = (
+    "INSERT OR IGNORE INTO embedding_cache (model, dimensions, hash, vector) "
+    "VALUES (?, ?, ?, ?)"
+)
+
+
+def _pack(vector: List[float]) -> bytes:
+    # float32, the precision the embeddings API and Chroma work with
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCacheRepository:
+    """Embedding vectors keyed by (model, dimensions, content hash)."""
+
+    @staticmethod
+    def get_many(model: str, dimensions: int, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        """Cached vectors for the given content hashes (misses are left out)."""
+        found: Dict[bytes, List[float]] = {}
+        if not hashes:
+            return found
+        try:
+            with get_pool().read() as cur:
+                for start in range(0, len(hashes), _LOOKUP_BATCH):
+                    batch = hashes[start:start + _LOOKUP_BATCH]
+                    sql = _SELECT_VECTORS_SQL.format(placeholders=",".join("?" * len(batch)))
+                    cur.execute(sql, (model, dimensions, *batch))
+                    for content_hash, blob in cur.fetchall():
+                        found[content_hash] = _unpack(blob)
+        except Exception as e:
+            print(f"[WARN] Embedding cache lookup failed: {e}")
+        return found
+
+    @staticmethod
+    def put_many(model: str, dimensions: int, vectors: Dict[bytes, List[float]]) -> None:
+        """Store vectors by content hash (existing entries are kept)."""
+        if not vectors:
+            return
+        rows = [(model, dimensions, h, _pack(v)) for h, v in vectors.items()]
+        try:
+            with get_pool().write() as cur:
+                cur.executemany(_INSERT_VECTOR_SQL, rows)
+        except Exception as e:
+            print(f"[WARN] Embedding cache store failed: {e}")
@@ -1,33 +1,58 @@
 """
 Repositories for manage the folders
 """
-from typing import List, Tuple
-from src.db.db import get_conn
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+from src.db.pool import get_pool
+
+_SELECT_FOLDERS_SQL = "SELECT folder_path FROM folders WHERE username = ? ORDER BY id"
+_INSERT_FOLDER_SQL = (
+    "INSERT OR IGNORE INTO folders (username, folder_path) VALUES (?, ?) "
+    "RETURNING folder_path"
+)
+_DELETE_FOLDER_SQL = (
+    "DELETE FROM folders WHERE username = ? AND folder_path = ? "
+    "RETURNING folder_path"
+)
+_EXISTS_FOLDER_SQL = "SELECT 1 FROM folders WHERE username = ? AND folder_path = ? LIMIT 1"
 
 
 class FolderRepository:
     """Repository for folders CRUD ."""
 
+    # Per-user folder list, refreshed on every add/remove (write-through)
+    _cache: Dict[str, List[str]] = {}
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def _cache_set(username: str, folders: List[str]) -> None:
+        with FolderRepository._cache_lock:
+            FolderRepository._cache[username] = list(folders)
+
+    @staticmethod
+    def _fetch_all(cur: sqlite3.Cursor, username: str) -> List[str]:
+        cur.execute(_SELECT_FOLDERS_SQL, (username,))
+        return [row[0] for row in cur.fetchall()]
+
     @staticmethod
     def add(username: str, folder_path: str) -> Tuple[bool, str, List[str]]:
         """Add a folder for an user."""
         if not username or not folder_path:
             return False, "Username and folder path required", []
         
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "INSERT OR IGNORE INTO folders (username, folder_path) VALUES (?, ?)",
-                (username, folder_path)
-            )
-            conn.commit()
-            folders = FolderRepository.get_all(username)
+            # Mutation + refreshed list in a single lease/transaction
+            with get_pool().write() as cur:
+                cur.execute(_INSERT_FOLDER_SQL, (username, folder_path))
+                inserted = cur.fetchone() is not None
+                folders = FolderRepository._fetch_all(cur, username)
+            FolderRepository._cache_set(username, folders)
+            if not inserted:
+                return True, "Folder already exists", folders
             return True, "Folder added successfully", folders
         except Exception as e:
             return False, f"Error adding folder: {e}", []
-        finally:
-            conn.close()
 
     @staticmethod
     def remove(username: str, folder_path: str) -> Tuple[bool, str, List[str]]:
@@ -35,20 +60,18 @@ class FolderRepository:
         if not username or not folder_path:
             return False, "Username and folder path required", []
         
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "DELETE FROM folders WHERE username = ? AND folder_path = ?",
-                (username, folder_path)
-            )
-            conn.commit()
-            folders = FolderRepository.get_all(username)
+            # Mutation + refreshed list in a single lease/transaction
+            with get_pool().write() as cur:
+                cur.execute(_DELETE_FOLDER_SQL, (username, folder_path))
+                removed = cur.fetchone() is not None
+                folders = FolderRepository._fetch_all(cur, username)
+            FolderRepository._cache_set(username, folders)
+            if not removed:
+                return True, "Folder not found", folders
             return True, "Folder removed successfully", folders
         except Exception as e:
             return False, f"Error removing folder: {e}", []
-        finally:
-            conn.close()
 
     @staticmethod
     def get_all(username: str) -> List[str]:
@@ -56,20 +79,19 @@ class FolderRepository:
         if not username:
             return []
         
-        conn = get_conn()
-        cur = conn.cursor()
+        with FolderRepository._cache_lock:
+            cached = FolderRepository._cache.get(username)
+        if cached is not None:
+            return list(cached)
+
         try:
-            cur.execute(
-                "SELECT folder_path FROM folders WHERE username = ?",
-                (username,)
-            )
-            folders = [row[0] for row in cur.fetchall()]
+            with get_pool().read() as cur:
+                folders = FolderRepository._fetch_all(cur, username)
+            FolderRepository._cache_set(username, folders)
             return folders
         except Exception as e:
             print(f"Error getting folders: {e}")
             return []
-        finally:
-            conn.close()
 
     @staticmethod
     def exists(username: str, folder_path: str) -> bool:
@@ -77,17 +99,10 @@ class FolderRepository:
         if not username or not folder_path:
             return False
         
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "SELECT COUNT(*) FROM folders WHERE username = ? AND folder_path = ?",
-                (username, folder_path)
-            )
-            count = cur.fetchone()[0]
-            return count > 0
+            with get_pool().read() as cur:
+                cur.execute(_EXISTS_FOLDER_SQL, (username, folder_path))
+                return cur.fetchone() is not None
         except Exception as e:
             print(f"Error checking folder existence: {e}")
-            return False
-        finally:
-            conn.close()
\ No newline at end of file
+            return False
\ No newline at end of file
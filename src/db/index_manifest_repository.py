@@ -0,0 +1,59 @@
+"""
+Repository for the index manifest (one row per indexed folder/file)
+"""
+from typing import Dict
+
+import orjson
+from src.db.pool import get_pool
+
+_SELECT_ENTRIES_SQL = "SELECT index_key, entry FROM index_manifest"
+_UPSERT_ENTRY_SQL = """
+    INSERT INTO index_manifest (index_key, entry) VALUES (?, ?)
+    ON CONFLICT(index_key) DO UPDATE SET entry = excluded.entry
+"""
+_DELETE_ENTRY_SQL = "DELETE FROM index_manifest WHERE index_key = ?"
+
+
+class IndexManifestRepository:
+    """Manifest entries ({persist_dir, chunk params, files}) keyed by index key."""
+
+    @staticmethod
+    def load_all() -> Dict[str, dict]:
+        """All manifest entries (empty on error)."""
+        try:
+            with get_pool().read() as cur:
+                cur.execute(_SELECT_ENTRIES_SQL)
+                rows = cur.fetchall()
+            return {index_key: orjson.loads(entry) for index_key, entry in rows}
+        except Exception as e:
+            print(f"[WARN] Could not load index manifest: {e}")
+            return {}
+
+    @staticmethod
+    def save_many(entries: Dict[str, dict]) -> bool:
+        """Insert or replace several entries in one transaction."""
+        if not entries:
+            return True
+        rows = [(k, orjson.dumps(v)) for k, v in entries.items()]
+        try:
+            with get_pool().write() as cur:
+                cur.executemany(_UPSERT_ENTRY_SQL, rows)
+            return True
+        except Exception as e:
+            print(f"[WARN] Could not save index manifest: {e}")
+            return False
+
+    @staticmethod
+    def save(index_key: str, entry: dict) -> bool:
+        """Insert or replace one entry."""
+        return IndexManifestRepository.save_many({index_key: entry})
+
+    @staticmethod
+    def delete(index_key: str) -> bool:
+        try:
+            with get_pool().write() as cur:
+                cur.execute(_DELETE_ENTRY_SQL, (index_key,))
+            return True
+        except Exception as e:
+            print(f"[WARN] Could not delete index manifest entry: {e}")
+            return False
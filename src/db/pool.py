@@ -0,0 +1,151 @@
+"""
+Shared SQLite connection pool.
+
+One dedicated read/write connection guarded by a lock, plus a small set of
+read-only connections handed out round-robin. Connections are opened once
+(PRAGMAs applied at that time) and reused for the lifetime of the process.
+
+An aiosqlite connection is also kept open for coroutines on the chat path,
+so they can persist state without blocking the event loop.
+"""
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import aiosqlite
+
+from src.db.db import get_async_conn, get_conn, is_memory_db
+
+
+class ConnectionPool:
+    """Pool with a single writer connection and K reader connections."""
+
+    def __init__(self, read_size: Optional[int] = None):
+        self._write_conn = get_conn()
+        self._write_lock = threading.Lock()
+
+        # An in-memory DB is private to its connection, so readers must
+        # go through the writer connection in that case.
+        if is_memory_db():
+            read_size = 0
+        elif read_size is None:
+            read_size = os.cpu_count() or 1
+
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(read_size):
+            reader = get_conn()
+            # Guard against accidental writes through a read lease
+            reader.execute("PRAGMA query_only = 1;")
+            self._readers.put(reader)
+        self._read_size = read_size
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Cursor]:
+        """Lease a read connection and yield a cursor on it."""
+        if self._read_size == 0:
+            with self._write_lock:
+                yield self._write_conn.cursor()
+            return
+
+        conn = self._readers.get()
+        try:
+            yield conn.cursor()
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Lease the writer connection and yield a cursor on it.
+        Commits on success, rolls back (and re-raises) on error.
+        """
+        with self._write_lock:
+            cur = self._write_conn.cursor()
+            try:
+                yield cur
+                self._write_conn.commit()
+            except Exception:
+                self._write_conn.rollback()
+                raise
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._write_lock:
+            self._write_conn.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Lazily build and return the process-wide connection pool."""
+    global _pool
+
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+
+    return _pool
+
+
+# aiosqlite connections are bound to the event loop that awaits them, so
+# each running loop gets its own shared connection (and its own lock).
+_async_conns: Dict[asyncio.AbstractEventLoop, aiosqlite.Connection] = {}
+_async_locks: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+
+
+def get_async_conn_lock() -> asyncio.Lock:
+    """
+    Return the running loop's lock for the shared aiosqlite connection.
+    The connection has a single implicit transaction, so each unit of work
+    on it (a save's statements + commit, or a load) runs under this lock.
+    """
+    loop = asyncio.get_running_loop()
+    lock = _async_locks.get(loop)
+    if lock is None:
+        lock = _async_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def get_shared_async_conn() -> aiosqlite.Connection:
+    """Lazily open and return the running loop's shared aiosqlite connection."""
+    loop = asyncio.get_running_loop()
+    conn = _async_conns.get(loop)
+    if conn is not None:
+        return conn
+
+    async with get_async_conn_lock():
+        conn = _async_conns.get(loop)
+        if conn is None:
+            conn = _async_conns[loop] = await get_async_conn()
+
+    return conn
+
+
+async def close_shared_async_conn() -> None:
+    """
+    Close every shared aiosqlite connection. Must be awaited on shutdown:
+    each connection runs on a non-daemon thread that would otherwise keep
+    the interpreter alive.
+    """
+    conns = list(_async_conns.values())
+    _async_conns.clear()
+    _async_locks.clear()
+    for conn in conns:
+        try:
+            await conn.close()
+        except Exception:
+            pass
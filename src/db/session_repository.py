@@ -1,150 +1,310 @@
 """
 Repository for managing the sessions
 """
-import json
+import threading
 import uuid
+from typing import Any, List, Optional, Tuple, Union
 
+import orjson
+import zstandard
 from langchain_core.messages import HumanMessage, AIMessage
-from src.db.db import get_conn
+from src.db.pool import get_async_conn_lock, get_pool, get_shared_async_conn
 from src.core.state import SidekickState
 
+_MSG_TYPE = {HumanMessage: "HumanMessage", AIMessage: "AIMessage"}
+# Stored type -> message class (anything else is rebuilt as an AIMessage)
+_MSG_CLASS = {"HumanMessage": HumanMessage}
+
+# Payloads at least this long are stored zstd-compressed (as BLOB); shorter
+# ones stay plain TEXT since compression does not pay off on tiny strings.
+_COMPRESS_MIN_BYTES = 512
+_ZSTD_LEVEL = 3
+
+# zstandard (de)compressor objects are not thread-safe
+_zstd_local = threading.local()
+
+# Frame header of zstd-compressed payloads (any other BLOB is stored raw)
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Marks a payload holding orjson-encoded non-str content (e.g. the list of
+# blocks of a multimodal or tool message), so it loads back as-is
+_JSON_MARKER = b"\x00"
+
+
+def _pack(content: Any) -> Union[str, bytes]:
+    if isinstance(content, str):
+        raw = content.encode()
+        if len(raw) < _COMPRESS_MIN_BYTES:
+            return content
+    else:
+        raw = _JSON_MARKER + orjson.dumps(content)
+        if len(raw) < _COMPRESS_MIN_BYTES:
+            return raw
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+    return compressor.compress(raw)
+
+
+def _unpack(value: Union[str, bytes, None]) -> Any:
+    if not isinstance(value, bytes):
+        return value or ""
+    raw = value
+    if raw.startswith(_ZSTD_MAGIC):
+        decompressor = getattr(_zstd_local, "decompressor", None)
+        if decompressor is None:
+            decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+        raw = decompressor.decompress(raw)
+    if raw.startswith(_JSON_MARKER):
+        return orjson.loads(raw[1:])
+    return raw.decode()
+
+
+def _tool_calls_blob(tool_calls) -> Optional[bytes]:
+    """orjson-encoded tool calls of a message (None when it has none)."""
+    if not tool_calls:
+        return None
+    try:
+        return orjson.dumps([
+            {
+                "name": tc.get("name", ""),
+                "args": tc.get("args", {}),
+                "id": tc.get("id", ""),
+            }
+            for tc in tool_calls
+        ])
+    except Exception:
+        return orjson.dumps([])
+
+
+_UPSERT_SESSION_SQL = """
+    INSERT INTO sessions (username, folder, data)
+    VALUES (?, ?, ?)
+    ON CONFLICT(username, folder)
+    DO UPDATE SET data = excluded.data;
+"""
+
+_SELECT_SESSION_SQL = "SELECT data FROM sessions WHERE username = ? AND folder = ?"
+
+_INSERT_MESSAGE_SQL = """
+    INSERT OR REPLACE INTO messages (username, folder, seq, type, content, tool_calls)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_SELECT_MESSAGES_SQL = """
+    SELECT type, content, tool_calls FROM messages
+    WHERE username = ? AND folder = ?
+    ORDER BY seq
+"""
+
+_DELETE_SESSION_SQL = "DELETE FROM sessions WHERE username = ? AND folder = ?"
+
+_TRUNCATE_MESSAGES_SQL = "DELETE FROM messages WHERE username = ? AND folder = ? AND seq >= ?"
+
+# Legacy sessions kept messages inside sessions.data (always plain TEXT)
+_CLEAR_LEGACY_MESSAGES_SQL = """
+    UPDATE sessions SET data = json_remove(data, '$.messages')
+    WHERE username = ? AND folder = ?
+      AND typeof(data) = 'text' AND json_type(data, '$.messages') IS NOT NULL
+"""
+
 
 class SessionRepository:
     """Repository for CRUD operations on sessions, keyed by (username, folder)."""
 
+    @staticmethod
+    def _serialize(state: SidekickState) -> Union[str, bytes]:
+        """
+        Serialize the scalar fields of a SidekickState into the JSON stored
+        in sessions.data (compressed when large). Messages live in the
+        messages table.
+        """
+        data = {
+            "session_id": getattr(state, "session_id", str(uuid.uuid4())),
+            "current_directory": getattr(state, "current_directory", None),
+            "indexed_directories": getattr(state, "indexed_directories", []),
+            "success_criteria": getattr(state, "success_criteria", None),
+            "criteria_met": getattr(state, "criteria_met", False),
+            "needs_user_input": getattr(state, "needs_user_input", False),
+            "task_metadata": getattr(state, "task_metadata", {}),
+        }
+
+        return _pack(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode())
+
+    @staticmethod
+    def _message_rows(username: str, folder: str, messages: list, start: int) -> List[Tuple]:
+        """Build messages table rows for messages[start:]."""
+        return [
+            (
+                username,
+                folder,
+                seq,
+                _MSG_TYPE.get(m.__class__) or m.__class__.__name__,
+                _pack(m.content or ""),
+                _tool_calls_blob(getattr(m, "tool_calls", None)),
+            )
+            for seq, m in enumerate(messages[start:], start)
+        ]
+
+    @staticmethod
+    def _build_message(msg_type: str, content: Any):
+        return _MSG_CLASS.get(msg_type, AIMessage)(content=content)
+
+    @staticmethod
+    def _deserialize(raw: Union[str, bytes], message_rows: list) -> SidekickState:
+        """Rebuild a SidekickState from sessions.data and its messages rows."""
+        data = orjson.loads(_unpack(raw))
+
+        # Rebuild messages
+        messages = [
+            SessionRepository._build_message(msg_type, _unpack(content))
+            for msg_type, content, _tool_calls in message_rows
+        ]
+        persisted_len = len(messages)
+
+        # Legacy rows kept the whole conversation inside sessions.data.
+        # Load it and leave _persisted_len at 0 so the next save moves it
+        # into the messages table.
+        if not messages and data.get("messages"):
+            messages = [
+                SessionRepository._build_message(m.get("type", ""), m.get("content", "") or "")
+                for m in data["messages"]
+            ]
+            persisted_len = 0
+
+        # Rebuild the state
+        state = SidekickState(
+            messages=messages,
+            session_id=data.get("session_id") or str(uuid.uuid4()),
+            current_directory=data.get("current_directory"),
+            indexed_directories=data.get("indexed_directories") or [],
+            success_criteria=data.get("success_criteria"),
+            criteria_met=data.get("criteria_met", False),
+            needs_user_input=data.get("needs_user_input", False),
+            task_metadata=data.get("task_metadata") or {},
+        )
+        state._persisted_len = persisted_len
+        return state
+
     @staticmethod
     def save(username: str, folder: str, state: SidekickState):
-        """Save the state of a session in the DB for a specific (username, folder)."""
-        conn = get_conn()
-        cur = conn.cursor()
+        """
+        Save the state of a session in the DB for a specific (username, folder).
+        Only messages added since the last save are written.
+        """
         try:
-            # Serialize messages
-            messages_data = []
-            for m in getattr(state, "messages", []):
-                msg_type = type(m).__name__
-                msg_dict = {
-                    "type": msg_type,
-                    "content": getattr(m, "content", ""),
-                }
-
-                # Handles tool_calls if present
-                if hasattr(m, "tool_calls") and getattr(m, "tool_calls"):
-                    try:
-                        msg_dict["tool_calls"] = [
-                            {
-                                "name": tc.get("name", ""),
-                                "args": tc.get("args", {}),
-                                "id": tc.get("id", ""),
-                            }
-                            for tc in m.tool_calls
-                        ]
-                    except Exception:
-                        msg_dict["tool_calls"] = []
-
-                messages_data.append(msg_dict)
-
-            # Build a dict with all relevant fields
-            data = {
-                "messages": messages_data,
-                "session_id": getattr(state, "session_id", str(uuid.uuid4())),
-                "current_directory": getattr(state, "current_directory", None),
-                "indexed_directories": getattr(state, "indexed_directories", []),
-                "success_criteria": getattr(state, "success_criteria", None),
-                "criteria_met": getattr(state, "criteria_met", False),
-                "needs_user_input": getattr(state, "needs_user_input", False),
-                "task_metadata": getattr(state, "task_metadata", {}),
-            }
-
-            json_data = json.dumps(data, ensure_ascii=False)
+            json_data = SessionRepository._serialize(state)
+            messages = getattr(state, "messages", [])
+            start = min(state._persisted_len, len(messages))
+            rows = SessionRepository._message_rows(username, folder, messages, start)
 
             # NOTE: requires a table with columns (username, folder, data)
             # and PRIMARY KEY(username, folder)
-            cur.execute(
-                """
-                INSERT INTO sessions (username, folder, data)
-                VALUES (?, ?, ?)
-                ON CONFLICT(username, folder)
-                DO UPDATE SET data = excluded.data;
-                """,
-                (username, folder, json_data),
-            )
+            with get_pool().write() as cur:
+                cur.execute(_UPSERT_SESSION_SQL, (username, folder, json_data))
+                # Drop rows past the current length (e.g. after clearing the chat)
+                cur.execute(_TRUNCATE_MESSAGES_SQL, (username, folder, start))
+                cur.executemany(_INSERT_MESSAGE_SQL, rows)
+
+            state._persisted_len = len(messages)
+        except Exception as e:
+            print(f"Error saving session: {e}")
 
-            conn.commit()
+    @staticmethod
+    async def save_async(username: str, folder: str, state: SidekickState):
+        """Async variant of save() using the shared aiosqlite connection."""
+        try:
+            conn = await get_shared_async_conn()
         except Exception as e:
             print(f"Error saving session: {e}")
-        finally:
-            conn.close()
+            return
+
+        async with get_async_conn_lock():
+            try:
+                # Read _persisted_len under the lock: a concurrent save of the
+                # same state may have just advanced it
+                json_data = SessionRepository._serialize(state)
+                messages = getattr(state, "messages", [])
+                start = min(state._persisted_len, len(messages))
+                rows = SessionRepository._message_rows(username, folder, messages, start)
+
+                await conn.execute(_UPSERT_SESSION_SQL, (username, folder, json_data))
+                await conn.execute(_TRUNCATE_MESSAGES_SQL, (username, folder, start))
+                await conn.executemany(_INSERT_MESSAGE_SQL, rows)
+                await conn.commit()
+
+                state._persisted_len = len(messages)
+            except Exception as e:
+                print(f"Error saving session: {e}")
+                try:
+                    await conn.rollback()
+                except Exception:
+                    pass
 
     @staticmethod
     def load(username: str, folder: str) -> SidekickState:
         """Load the state of a session for a specific (username, folder)."""
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "SELECT data FROM sessions WHERE username = ? AND folder = ?",
-                (username, folder),
-            )
-            row = cur.fetchone()
-
-            if not row:
-                # No session yet for this (user, folder)
-                return SidekickState()
-
-            data = json.loads(row[0])
-
-            # Rebuild messages
-            messages = []
-            for m in data.get("messages", []):
-                msg_type = m.get("type", "")
-                content = m.get("content", "") or ""
-
-                if msg_type == "HumanMessage":
-                    messages.append(HumanMessage(content=content))
-                else:
-                    messages.append(AIMessage(content=content))
-
-            # Rebuild the state
-            state = SidekickState(
-                messages=messages,
-                session_id=data.get("session_id") or str(uuid.uuid4()),
-                current_directory=data.get("current_directory"),
-                indexed_directories=data.get("indexed_directories") or [],
-                success_criteria=data.get("success_criteria"),
-                criteria_met=data.get("criteria_met", False),
-                needs_user_input=data.get("needs_user_input", False),
-                task_metadata=data.get("task_metadata") or {},
-            )
+            with get_pool().read() as cur:
+                cur.execute(_SELECT_SESSION_SQL, (username, folder))
+                row = cur.fetchone()
 
-            return state
+                if not row:
+                    # No session yet for this (user, folder)
+                    return SidekickState()
+
+                cur.execute(_SELECT_MESSAGES_SQL, (username, folder))
+                message_rows = cur.fetchall()
+
+            return SessionRepository._deserialize(row[0], message_rows)
+        except Exception as e:
+            print(f"Error loading session: {e}")
+            return SidekickState()
+
+    @staticmethod
+    async def load_async(username: str, folder: str) -> SidekickState:
+        """Async variant of load() using the shared aiosqlite connection."""
+        try:
+            conn = await get_shared_async_conn()
+            # Never read in the middle of a save on the same connection
+            async with get_async_conn_lock():
+                async with conn.execute(_SELECT_SESSION_SQL, (username, folder)) as cur:
+                    row = await cur.fetchone()
+
+                if not row:
+                    # No session yet for this (user, folder)
+                    return SidekickState()
+
+                async with conn.execute(_SELECT_MESSAGES_SQL, (username, folder)) as cur:
+                    message_rows = await cur.fetchall()
+
+            return SessionRepository._deserialize(row[0], message_rows)
         except Exception as e:
             print(f"Error loading session: {e}")
             return SidekickState()
-        finally:
-            conn.close()
 
     @staticmethod
     def delete(username: str, folder: str) -> bool:
         """Delete the session for a specific (username, folder)."""
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "DELETE FROM sessions WHERE username = ? AND folder = ?",
-                (username, folder),
-            )
-            conn.commit()
+            with get_pool().write() as cur:
+                cur.execute(_DELETE_SESSION_SQL, (username, folder))
+                cur.execute(_TRUNCATE_MESSAGES_SQL, (username, folder, 0))
             return True
         except Exception as e:
             print(f"Error deleting session: {e}")
             return False
-        finally:
-            conn.close()
 
     @staticmethod
     def clear_messages(username: str, folder: str) -> bool:
-        """Clear messages for a specific (username, folder) session."""
-        state = SessionRepository.load(username, folder)
-        state.messages = []
-        SessionRepository.save(username, folder, state)
-        return True
+        """
+        Clear messages for a specific (username, folder) session, in place:
+        nothing is loaded or re-serialized.
+        """
+        try:
+            with get_pool().write() as cur:
+                cur.execute(_TRUNCATE_MESSAGES_SQL, (username, folder, 0))
+                cur.execute(_CLEAR_LEGACY_MESSAGES_SQL, (username, folder))
+            return True
+        except Exception as e:
+            print(f"Error clearing messages: {e}")
+            return False
@@ -1,34 +1,34 @@
 from typing import Optional
 
-from src.db.db import get_conn
+from src.db.pool import get_pool
+
+_SELECT_USER_SQL = "SELECT username, password FROM users WHERE username = ?"
+_INSERT_USER_SQL = "INSERT INTO users (username, password) VALUES (?, ?)"
+_UPDATE_PASSWORD_SQL = "UPDATE users SET password = ? WHERE username = ?"
 
 
 class UserRepository:
     def get_user(self, username: str) -> Optional[dict]:
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT username, password FROM users WHERE username = ?",
-            (username,),
-        )
-        row = cur.fetchone()
-        conn.close()
+        with get_pool().read() as cur:
+            cur.execute(_SELECT_USER_SQL, (username,))
+            row = cur.fetchone()
 
         if row:
             return {"username": row[0], "password": row[1]}
         return None
 
     def create_user(self, username: str, hashed_password: str) -> bool:
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "INSERT INTO users (username, password) VALUES (?, ?)",
-                (username, hashed_password),
-            )
-            conn.commit()
+            with get_pool().write() as cur:
+                cur.execute(_INSERT_USER_SQL, (username, hashed_password))
+            return True
+        except Exception:
+            return False
+
+    def update_password(self, username: str, hashed_password: str) -> bool:
+        try:
+            with get_pool().write() as cur:
+                cur.execute(_UPDATE_PASSWORD_SQL, (hashed_password, username))
             return True
         except Exception:
             return False
-        finally:
-            conn.close()
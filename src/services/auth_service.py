@@ -1,7 +1,28 @@
 import hashlib
+import hmac
+import secrets
+import threading
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TTLCache
 
 from src.db.user_repository import UserRepository
 
+_password_hasher = PasswordHasher()
+
+# Short-lived memo of successful verifications so repeated submits from the
+# UI skip the (deliberately slow) KDF. Keys never hold the raw password.
+_VERIFY_CACHE_TTL_S = 60
+_verify_cache: TTLCache = TTLCache(maxsize=256, ttl=_VERIFY_CACHE_TTL_S)
+_verify_cache_lock = threading.Lock()
+_verify_cache_salt = secrets.token_bytes(16)
+
+
+def _verify_cache_key(username: str, password: str) -> tuple:
+    digest = hmac.new(_verify_cache_salt, password.encode(), hashlib.sha256).digest()
+    return (username, digest)
+
 
 class AuthService:
     def __init__(self):
@@ -9,10 +30,26 @@ class AuthService:
 
     def hash_password(self, password: str) -> str:
         """
-        Hash sencillo con SHA256 (para demo / entorno simple).
+        Hash with Argon2id. The encoded result includes salt and parameters.
+        """
+        return _password_hasher.hash(password)
+
+    def _legacy_hash_password(self, password: str) -> str:
+        """
+        Old unsalted SHA256 scheme, only used to verify accounts created
+        before the switch to Argon2.
         """
         return hashlib.sha256(password.encode()).hexdigest()
 
+    def verify_password(self, stored: str, password: str) -> bool:
+        if not stored.startswith("$argon2"):
+            return hmac.compare_digest(stored, self._legacy_hash_password(password))
+
+        try:
+            return _password_hasher.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
     def register(self, username: str, password: str):
         if not username or not password:
             return False, "Username and password required"
@@ -37,8 +74,25 @@ class AuthService:
         if not user:
             return False, "User not found"
 
-        hashed = self.hash_password(password)
-        if hashed != user["password"]:
+        stored = user["password"]
+        cache_key = _verify_cache_key(username, password)
+
+        with _verify_cache_lock:
+            cached = _verify_cache.get(cache_key)
+        # Only trust the memo if it was made against the current stored hash
+        if cached is not None and hmac.compare_digest(cached, stored):
+            return True, "Logged in"
+
+        if not self.verify_password(stored, password):
             return False, "Wrong password"
 
+        # Transparently upgrade legacy SHA256 hashes (or outdated Argon2 params)
+        if not stored.startswith("$argon2") or _password_hasher.check_needs_rehash(stored):
+            upgraded = self.hash_password(password)
+            if self.repo.update_password(username, upgraded):
+                stored = upgraded
+
+        with _verify_cache_lock:
+            _verify_cache[cache_key] = stored
+
         return True, "Logged in"
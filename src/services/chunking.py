@@ -0,0 +1,100 @@
+"""
+Text chunking helpers.
+
+Kept apart from the indexing service so chunking worker processes (spawned
+by IndexingService) only import the tokenizer and text splitters, not the
+vectorstore/LLM stack.
+"""
+
+import uuid
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import tiktoken
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+# Tokenizer used to measure chunk sizes (matches OpenAI embedding models)
+CHUNK_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = CHUNK_ENCODING):
+    return tiktoken.get_encoding(name)
+
+
+def make_splitter(
+    language: Optional[Language], chunk_size: int, chunk_overlap: int
+) -> RecursiveCharacterTextSplitter:
+    """Token-based splitter, using code-aware separators when a language is given."""
+    if language is None:
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=CHUNK_ENCODING,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=CHUNK_ENCODING,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=RecursiveCharacterTextSplitter.get_separators_for_language(language),
+        is_separator_regex=True,
+    )
+
+
+def merge_small_chunks(chunks: List, chunk_size: int, min_chunk_tokens: int) -> List:
+    """
+    Fold chunks under min_chunk_tokens into the previous chunk of the
+    same source, as long as the result stays close to chunk_size.
+    """
+    encoding = get_encoding()
+    min_tokens = min(min_chunk_tokens, chunk_size // 2)
+
+    merged: List = []
+    last_tokens = 0
+    for chunk in chunks:
+        tokens = len(encoding.encode(chunk.page_content, disallowed_special=()))
+        if (
+            merged
+            and (tokens < min_tokens or last_tokens < min_tokens)
+            and last_tokens + tokens <= chunk_size + min_tokens
+            and merged[-1].metadata.get("source") == chunk.metadata.get("source")
+            and merged[-1].metadata.get("parent_id") == chunk.metadata.get("parent_id")
+        ):
+            merged[-1].page_content += "\n" + chunk.page_content
+            last_tokens += tokens
+            continue
+        merged.append(chunk)
+        last_tokens = tokens
+    return merged
+
+
+def split_documents(
+    docs: List,
+    language: Optional[Language],
+    chunk_size: int,
+    chunk_overlap: int,
+    parent_factor: Optional[int],
+    min_chunk_tokens: int,
+) -> Tuple[List, Dict[str, dict]]:
+    """
+    Split documents into chunks. With a parent_factor, documents are first
+    split into parents of parent_factor x chunk_size tokens and the chunks
+    are their children. Returns (chunks, parents by id).
+    """
+    splitter = make_splitter(language, chunk_size, chunk_overlap)
+    parents: Dict[str, dict] = {}
+    if parent_factor is None:
+        chunks = splitter.split_documents(docs)
+    else:
+        chunks = []
+        parent_splitter = make_splitter(language, chunk_size * parent_factor, chunk_overlap)
+        for parent in parent_splitter.split_documents(docs):
+            parent_id = uuid.uuid4().hex
+            parents[parent_id] = {
+                "page_content": parent.page_content,
+                "metadata": parent.metadata,
+            }
+            for child in splitter.split_documents([parent]):
+                child.metadata["parent_id"] = parent_id
+                chunks.append(child)
+    return merge_small_chunks(chunks, chunk_size, min_chunk_tokens), parents
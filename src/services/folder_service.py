@@ -1,5 +1,4 @@
 import os
-import asyncio
 
 from src.core.sidekick import Sidekick
 from src.utils.path_utils import normalize_path, get_absolute_path
@@ -29,7 +28,7 @@ class FolderService:
         self,
         folder: str,
         state,
-        chunk_size: int = 600,
+        chunk_size: int = 200,
         chunk_overlap: int = 20,
     ):
         """
@@ -49,9 +48,8 @@ class FolderService:
         index_key = _make_index_key(path)
 
         if not self.sidekick.retrieval_service.has_retriever(index_key):
-            # index_path is synchronous -> run in worker thread
-            result_msg = await asyncio.to_thread(
-                self.sidekick.index_path,
+            # Blocking steps run in worker threads; embeddings are async
+            result_msg = await self.sidekick.index_path_async(
                 path,
                 False,           # force_reindex=False
                 chunk_size,
@@ -66,7 +64,7 @@ class FolderService:
         self,
         folder: str,
         state,
-        chunk_size: int = 600,
+        chunk_size: int = 200,
         chunk_overlap: int = 20,
     ):
         """
@@ -80,8 +78,7 @@ class FolderService:
 
         state.current_directory = path
 
-        result_msg = await asyncio.to_thread(
-            self.sidekick.index_path,
+        result_msg = await self.sidekick.index_path_async(
             path,
             True,            # force_reindex=True
             chunk_size,
@@ -101,6 +98,6 @@ class FolderService:
 
         state.current_directory = path
 
-        result_msg = await asyncio.to_thread(self.sidekick.remove_path, path)
+        result_msg = await self.sidekick.remove_path_async(path)
         print(result_msg)
         return state
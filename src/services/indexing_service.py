@@ -3,13 +3,19 @@ Index service.
 Handles loading, processing and creation of vectorstore.
 """
 
+import asyncio
 import glob
+import hashlib
+import multiprocessing
 import os
 import shutil
 import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from langchain_community.document_loaders import (
     PyPDFLoader,
@@ -17,23 +23,67 @@ from langchain_community.document_loaders import (
     TextLoader,
     UnstructuredMarkdownLoader,
 )
+import orjson
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_text_splitters import Language
 
+from src.db.embedding_cache_repository import EmbeddingCacheRepository
+from src.services.chunking import split_documents
+from src.services.retrieval_service import ParentChildRetriever
 from src.utils.path_utils import is_excluded_path, normalize_path
 
+# Reuse embeddings of previously seen chunk texts across runs (SQLite cache)
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1") == "1"
+
 
 class IndexingService:
     """Service to index folders/files and create/load persistent vectorstores."""
 
     SUPPORTED_EXTENSIONS = {".md", ".txt", ".py", ".pdf"}
 
+    # Chunks sent per embeddings request, and a rough token budget per
+    # request (~4 chars/token) to stay well under the API's per-request limit.
+    EMBED_BATCH_SIZE = 256
+    EMBED_BATCH_MAX_TOKENS = 200_000
+    # Embeddings requests in flight at once (async indexing)
+    EMBED_CONCURRENCY = 8
+
+    # Chunks shorter than this (tokens) are merged into their neighbour
+    MIN_CHUNK_TOKENS = 100
+
+    # Parent chunks (returned to the LLM) are this many times larger than
+    # the child chunks that get embedded
+    PARENT_CHUNK_FACTOR = 4
+    # New collections use cosine distance (OpenAI embeddings are normalized)
+    COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+    # Parent chunk store, kept next to the Chroma files in persist_dir
+    PARENTS_FILE = "parents.json"
+
+    # Extensions split on language-level boundaries (defs, classes, ...)
+    LANGUAGE_BY_EXTENSION = {".py": Language.PYTHON}
+
+    # Splitting runs in worker processes from this many documents on,
+    # CHUNK_JOB_DOCS documents per task. Spawned workers cost an interpreter
+    # start each, so their number is capped.
+    PROCESS_POOL_MIN_DOCS = 64
+    PROCESS_POOL_MAX_WORKERS = 4
+    CHUNK_JOB_DOCS = 16
+
+    # Pipelined indexing: files loaded and split per group, and how many
+    # split groups may wait for the embedder before loading pauses
+    PIPELINE_GROUP_FILES = 64
+    PIPELINE_QUEUE_SIZE = 4
+
     def __init__(self, embeddings: OpenAIEmbeddings, vectorstore_root: str):
         self.embeddings = embeddings
         self.vectorstore_root = vectorstore_root
         os.makedirs(self.vectorstore_root, exist_ok=True)
 
+        # Started lazily on the first large chunking job
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
     # -------------------- Document loading --------------------
 
     def load_documents(
@@ -245,6 +295,104 @@ class IndexingService:
         print(f"[INFO] Loaded {len(docs)} PDF files")
         return docs
 
+    # -------------------- Change detection --------------------
+
+    def list_files(
+        self,
+        path: str,
+        excluded_dirs: Optional[List[str]] = None,
+        recursive: bool = True,
+    ) -> List[str]:
+        """Supported files that load_documents(path) would read."""
+        excluded_dirs = excluded_dirs or [".venv", "venv", "__pycache__"]
+        path = normalize_path(path)
+
+        if os.path.isfile(path):
+            ext = Path(path).suffix.lower()
+            if ext in self.SUPPORTED_EXTENSIONS and not is_excluded_path(path, excluded_dirs):
+                return [path]
+            return []
+
+        pattern = "**" if recursive else "*"
+        files: List[str] = []
+        for ext in sorted(self.SUPPORTED_EXTENSIONS):
+            for p in glob.glob(os.path.join(path, pattern, f"*{ext}"), recursive=True):
+                if not is_excluded_path(p, excluded_dirs) and os.path.isfile(p):
+                    files.append(normalize_path(p))
+        return files
+
+    @staticmethod
+    def fingerprint_file(path: str, st: Optional[os.stat_result] = None) -> Optional[dict]:
+        """Content hash, mtime and size of a file (None if it cannot be read)."""
+        try:
+            st = st or os.stat(path)
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16))
+            return {
+                "hash": digest.hexdigest(),
+                "mtime": st.st_mtime,
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+            }
+        except OSError as e:
+            print(f"[WARN] Could not fingerprint {path}: {e}")
+            return None
+
+    def diff_files(
+        self, path: str, known: Dict[str, dict], recursive: bool = True
+    ) -> Tuple[Dict[str, dict], List[str], List[str]]:
+        """
+        Compare the files under path with a previous {file: fingerprint} map.
+        Returns (current fingerprints, changed or new files, removed files).
+
+        Files whose (mtime_ns, size) are unchanged are not read at all; the
+        content hash only settles the ambiguous case (touched but same size).
+        """
+        current: Dict[str, dict] = {}
+        changed: List[str] = []
+        for file_path in self.list_files(path, recursive=recursive):
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                print(f"[WARN] Could not stat {file_path}: {e}")
+                continue
+
+            old = known.get(file_path)
+            if (
+                old is not None
+                and old.get("mtime_ns") == st.st_mtime_ns
+                and old.get("size") == st.st_size
+            ):
+                current[file_path] = {
+                    k: old[k] for k in ("hash", "mtime", "mtime_ns", "size") if k in old
+                }
+                continue
+
+            fp = self.fingerprint_file(file_path, st)
+            if fp is None:
+                continue
+            current[file_path] = fp
+            if old is None or old.get("hash") != fp["hash"]:
+                changed.append(file_path)
+        removed = [p for p in known if p not in current]
+        return current, changed, removed
+
+    @staticmethod
+    def file_records(fingerprints: Dict[str, dict], chunks: List) -> Dict[str, dict]:
+        """Per-file manifest records: fingerprint plus the ids of its chunks/parents."""
+        records = {
+            p: {**fp, "chunk_ids": [], "parent_ids": []} for p, fp in fingerprints.items()
+        }
+        for chunk in chunks:
+            record = records.get(chunk.metadata.get("file_path"))
+            if record is None:
+                continue
+            record["chunk_ids"].append(chunk.id)
+            parent_id = chunk.metadata.get("parent_id")
+            if parent_id and (not record["parent_ids"] or record["parent_ids"][-1] != parent_id):
+                record["parent_ids"].append(parent_id)
+        return records
+
     # -------------------- Preprocessing --------------------
 
     def normalize_document_metadata(self, docs: List) -> List:
@@ -263,49 +411,337 @@ class IndexingService:
             valid_docs.append(doc)
         return valid_docs
 
-    def chunk_documents(self, docs: List, chunk_size: int = 600, chunk_overlap: int = 20) -> List:
-        """Divide documents into chunks."""
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, chunk_overlap=chunk_overlap
-        )
-        return splitter.split_documents(docs)
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=min(self.PROCESS_POOL_MAX_WORKERS, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._process_pool
+
+    def shutdown(self) -> None:
+        """Stop the chunking worker processes (if they were started)."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def chunk_documents(
+        self,
+        docs: List,
+        chunk_size: int = 200,
+        chunk_overlap: int = 20,
+        parents: Optional[Dict[str, dict]] = None,
+    ) -> List:
+        """
+        Divide documents into chunks (chunk_size and chunk_overlap in tokens).
+        Documents are grouped by extension so source code is split on
+        definitions rather than at arbitrary lines.
+
+        If `parents` is given, documents are first split into parent chunks
+        (PARENT_CHUNK_FACTOR x chunk_size), stored there by id, and the
+        returned chunks are their children, tagged with metadata["parent_id"].
+
+        Large document sets are split in worker processes.
+        """
+        groups: dict = {}
+        for doc in docs:
+            ext = Path(doc.metadata.get("source", "")).suffix.lower()
+            groups.setdefault(self.LANGUAGE_BY_EXTENSION.get(ext), []).append(doc)
+
+        parent_factor = self.PARENT_CHUNK_FACTOR if parents is not None else None
+        jobs = [
+            (group[i:i + self.CHUNK_JOB_DOCS], language)
+            for language, group in groups.items()
+            for i in range(0, len(group), self.CHUNK_JOB_DOCS)
+        ]
+        args = (chunk_size, chunk_overlap, parent_factor, self.MIN_CHUNK_TOKENS)
+
+        if len(docs) >= self.PROCESS_POOL_MIN_DOCS and (os.cpu_count() or 1) > 1:
+            pool = self._get_process_pool()
+            futures = [
+                pool.submit(split_documents, job_docs, language, *args)
+                for job_docs, language in jobs
+            ]
+            results = [f.result() for f in futures]
+        else:
+            results = [split_documents(job_docs, language, *args) for job_docs, language in jobs]
+
+        chunks: List = []
+        for job_chunks, job_parents in results:
+            chunks.extend(job_chunks)
+            if parents is not None:
+                parents.update(job_parents)
+
+        # Stable ids so a file's chunks can be deleted on incremental reindex
+        for chunk in chunks:
+            chunk.id = uuid.uuid4().hex
+        return chunks
 
     # -------------------- Vectorstore creation & loading --------------------
 
-    def create_vectorstore(
-        self, chunks: List, directory_name: str
-    ) -> Tuple[Optional[Chroma], Optional[str]]:
+    def _embedding_batches(self, chunks: List) -> Iterator[List]:
         """
-        Create a persistent Chroma vectorstore.
-        directory_name is used only to create a readable persist folder name.
+        Yield consecutive slices of chunks, each small enough (in count and
+        approximate tokens) to be embedded in a single request.
         """
-        persist_dir = os.path.join(
+        batch: List = []
+        batch_tokens = 0
+        for chunk in chunks:
+            tokens = len(chunk.page_content) // 4 + 1
+            if batch and (
+                len(batch) >= self.EMBED_BATCH_SIZE
+                or batch_tokens + tokens > self.EMBED_BATCH_MAX_TOKENS
+            ):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _content_key(chunk) -> bytes:
+        """Content hash used to embed identical chunk texts only once."""
+        return hashlib.blake2b(chunk.page_content.encode(), digest_size=16).digest()
+
+    def _duplicate_keys(self, chunks: List) -> set:
+        """Content keys that occur more than once across chunks."""
+        counts = Counter(self._content_key(c) for c in chunks)
+        return {key for key, n in counts.items() if n > 1}
+
+    @staticmethod
+    def _stored_vectors(vectorstore: Chroma, ids_by_key: Dict[bytes, str]) -> Dict[bytes, List[float]]:
+        """Read back the vectors of chunks already written to the vectorstore, by content key."""
+        if not ids_by_key:
+            return {}
+        got = vectorstore._collection.get(ids=list(ids_by_key.values()), include=["embeddings"])
+        by_id = {i: [float(x) for x in v] for i, v in zip(got["ids"], got["embeddings"])}
+        return {key: by_id[i] for key, i in ids_by_key.items() if i in by_id}
+
+    def _cache_config(self) -> Tuple[str, int]:
+        """(model, dimensions) the cached vectors of this service belong to."""
+        model = getattr(self.embeddings, "model", None) or ""
+        return model, getattr(self.embeddings, "dimensions", None) or 0
+
+    def _cached_vectors(self, pending: Dict[bytes, str]) -> Dict[bytes, List[float]]:
+        if not EMBEDDING_CACHE or not pending:
+            return {}
+        return EmbeddingCacheRepository.get_many(*self._cache_config(), list(pending))
+
+    def _cache_vectors(self, vectors: Dict[bytes, List[float]]) -> None:
+        if EMBEDDING_CACHE and vectors:
+            EmbeddingCacheRepository.put_many(*self._cache_config(), vectors)
+
+    @staticmethod
+    def _add_embedded_batch(vectorstore: Chroma, batch: List, vectors: List) -> None:
+        """Write one batch of chunks with precomputed embeddings to Chroma."""
+        vectorstore._collection.add(
+            ids=[c.id or uuid.uuid4().hex for c in batch],
+            embeddings=vectors,
+            documents=[c.page_content for c in batch],
+            metadatas=[c.metadata for c in batch],
+        )
+
+    def _new_persist_dir(self, directory_name: str) -> str:
+        """Fresh persist folder; directory_name only makes it readable."""
+        return os.path.join(
             self.vectorstore_root,
             f"{os.path.basename(directory_name)}_{uuid.uuid4().hex[:8]}",
         )
 
-        try:
-            os.makedirs(persist_dir, exist_ok=True)
-            vectorstore = Chroma.from_documents(
-                chunks, self.embeddings, persist_directory=persist_dir
+    async def _open_new_vectorstore_async(self, persist_dir: str) -> Chroma:
+        os.makedirs(persist_dir, exist_ok=True)
+        return await asyncio.to_thread(
+            Chroma,
+            persist_directory=persist_dir,
+            embedding_function=self.embeddings,
+            collection_metadata=self.COLLECTION_METADATA,
+        )
+
+    def _prepare_file_group(self, paths: List[str], chunk_size: int, chunk_overlap: int):
+        """
+        Load, normalize and split one group of files (blocking).
+        Returns (chunks, parents, file records, number of documents).
+        """
+        # Fingerprint before loading: a file edited while it is being indexed
+        # then looks changed on the next incremental reindex (recording the
+        # new stat/hash against the old content would hide the edit for good)
+        fingerprints = {}
+        for path in paths:
+            fp = self.fingerprint_file(path)
+            if fp is not None:
+                fingerprints[path] = fp
+        docs = self.normalize_document_metadata(self.load_documents_from_paths(paths))
+        parents: Dict[str, dict] = {}
+        chunks = (
+            self.chunk_documents(
+                docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap, parents=parents
             )
-            return vectorstore, persist_dir
+            if docs else []
+        )
+        return chunks, parents, self.file_records(fingerprints, chunks), len(docs)
+
+    async def index_files_async(
+        self,
+        paths: List[str],
+        directory_name: str,
+        chunk_size: int = 200,
+        chunk_overlap: int = 20,
+    ) -> Optional[Tuple[Chroma, str, Dict[str, dict], Dict[str, dict], int, int]]:
+        """
+        Build a new vectorstore from files as a pipeline: the next group of
+        files is loaded and split in a worker thread while the previous one
+        is being embedded, with at most PIPELINE_QUEUE_SIZE groups buffered.
+
+        Returns (vectorstore, persist_dir, parents, file records, n_chunks,
+        n_docs), or None on failure.
+        """
+        persist_dir = self._new_persist_dir(directory_name)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+
+        async def produce() -> None:
+            try:
+                for start in range(0, len(paths), self.PIPELINE_GROUP_FILES):
+                    group = paths[start:start + self.PIPELINE_GROUP_FILES]
+                    await queue.put(
+                        await asyncio.to_thread(
+                            self._prepare_file_group, group, chunk_size, chunk_overlap
+                        )
+                    )
+            except Exception:
+                # Wake the consumer; the error is re-raised when it awaits us
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        producer: Optional[asyncio.Task] = None
+        try:
+            vectorstore = await self._open_new_vectorstore_async(persist_dir)
+            producer = asyncio.create_task(produce())
+
+            parents: Dict[str, dict] = {}
+            files: Dict[str, dict] = {}
+            # Content key -> stored chunk id, shared by all groups of the job
+            written: Dict[bytes, str] = {}
+            n_chunks = n_docs = 0
+            while (group := await queue.get()) is not None:
+                chunks, group_parents, group_files, group_docs = group
+                await self.add_chunks_async(vectorstore, chunks, written)
+                parents.update(group_parents)
+                files.update(group_files)
+                n_chunks += len(chunks)
+                n_docs += group_docs
+            # Surfaces loading/splitting errors from the producer
+            await producer
+
+            await asyncio.to_thread(self.save_parents, persist_dir, parents)
+            return vectorstore, persist_dir, parents, files, n_chunks, n_docs
         except Exception as e:
             print(f"[ERROR] Failed to create vectorstore: {e}")
+            if producer is not None:
+                producer.cancel()
             # Cleanup in case of error
             try:
                 if os.path.exists(persist_dir):
                     shutil.rmtree(persist_dir)
             except Exception:
                 pass
-            return None, None
+            return None
+
+    async def add_chunks_async(
+        self,
+        vectorstore: Chroma,
+        chunks: List,
+        written: Optional[Dict[bytes, str]] = None,
+    ) -> None:
+        """
+        Embed chunks (concurrent batches) and add them to an existing vectorstore.
 
-    def load_vectorstore(self, persist_dir: str) -> Optional[Chroma]:
+        Identical texts (license headers, boilerplate) are embedded once.
+        `written` maps content keys to the id of a chunk already stored in
+        this vectorstore; pass the same dict to every call of one job so
+        texts written by an earlier call are read back instead of embedded.
+        """
+        written = {} if written is None else written
+        # Vectors of texts that occur again later in this call
+        duplicates = self._duplicate_keys(chunks)
+        shared: Dict[bytes, List[float]] = {}
+
+        # Work in windows of EMBED_CONCURRENCY batches: embed the texts a
+        # window still needs concurrently, write it, then let it go, so only
+        # one window of vectors is held in memory at a time.
+        batches = self._embedding_batches(chunks)
+        while True:
+            window = list(islice(batches, self.EMBED_CONCURRENCY))
+            if not window:
+                break
+            keys = [[self._content_key(c) for c in batch] for batch in window]
+
+            # One chunk per text the window needs, decided before any request
+            # is sent, so concurrent batches never embed the same text twice
+            todo: Dict[bytes, object] = {}
+            for batch, batch_keys in zip(window, keys):
+                for key, chunk in zip(batch_keys, batch):
+                    if key not in shared and key not in todo:
+                        todo[key] = chunk
+
+            vectors = await asyncio.to_thread(
+                self._stored_vectors,
+                vectorstore,
+                {key: written[key] for key in todo if key in written},
+            )
+            # Texts embedded in earlier runs come from the on-disk cache
+            vectors.update(
+                await asyncio.to_thread(
+                    self._cached_vectors,
+                    {k: c.page_content for k, c in todo.items() if k not in vectors},
+                )
+            )
+            missing = [(k, c) for k, c in todo.items() if k not in vectors]
+            if missing:
+                request_batches = list(self._embedding_batches([c for _, c in missing]))
+                results = await asyncio.gather(
+                    *(
+                        self.embeddings.aembed_documents([c.page_content for c in b])
+                        for b in request_batches
+                    )
+                )
+                embedded = dict(
+                    zip((k for k, _ in missing), (v for r in results for v in r))
+                )
+                await asyncio.to_thread(self._cache_vectors, embedded)
+                vectors.update(embedded)
+
+            for key in duplicates.intersection(vectors):
+                shared[key] = vectors[key]
+            for batch, batch_keys in zip(window, keys):
+                await asyncio.to_thread(
+                    self._add_embedded_batch,
+                    vectorstore,
+                    batch,
+                    [vectors[k] if k in vectors else shared[k] for k in batch_keys],
+                )
+                for key, chunk in zip(batch_keys, batch):
+                    if chunk.id:
+                        written.setdefault(key, chunk.id)
+            del window, keys, todo, vectors
+
+    @staticmethod
+    def delete_chunks(vectorstore: Chroma, chunk_ids: List[str]) -> None:
+        """Delete chunks from a vectorstore by id."""
+        if chunk_ids:
+            vectorstore._collection.delete(ids=chunk_ids)
+
+    def load_vectorstore(
+        self, persist_dir: str, embeddings: Optional[OpenAIEmbeddings] = None
+    ) -> Optional[Chroma]:
         """
         Load an existing Chroma vectorstore from disk.
 
         Used at startup to restore previously indexed folders/files
-        without re-indexing documents.
+        without re-indexing documents. `embeddings` must match the model the
+        index was built with (defaults to the current one).
         """
         try:
             if not os.path.exists(persist_dir):
@@ -314,13 +750,42 @@ class IndexingService:
 
             vectorstore = Chroma(
                 persist_directory=persist_dir,
-                embedding_function=self.embeddings,
+                embedding_function=embeddings or self.embeddings,
             )
             return vectorstore
         except Exception as e:
             print(f"[ERROR] Failed to load vectorstore from {persist_dir}: {e}")
             return None
 
+    def save_parents(self, persist_dir: str, parents: Dict[str, dict]) -> None:
+        """Persist the parent chunk store of an index."""
+        with open(os.path.join(persist_dir, self.PARENTS_FILE), "wb") as f:
+            f.write(orjson.dumps(parents))
+
+    def load_parents(self, persist_dir: str) -> Optional[Dict[str, dict]]:
+        """Load the parent chunk store of an index (None for flat indexes)."""
+        path = os.path.join(persist_dir, self.PARENTS_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            print(f"[WARN] Could not load parent chunks from {path}: {e}")
+            return None
+
+    def make_retriever(
+        self, vectorstore: Chroma, parents: Optional[Dict[str, dict]], k: int
+    ):
+        """
+        Retriever for an index: small-to-big when a parent store exists,
+        plain vector search otherwise (indexes built before parent chunks).
+        """
+        child_retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+        if parents is None:
+            return child_retriever
+        return ParentChildRetriever(child_retriever=child_retriever, parents=parents)
+
     def remove_vectorstore(self, persist_dir: str) -> bool:
         """Delete a vector store from disk."""
         try:
@@ -3,7 +3,39 @@ Retrieval service (RAG).
 Handles registration of retrievers and searches.
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# Characters of each retrieved document shown to the LLM
+MAX_DOC_CHARS = 2000
+
+
+class ParentChildRetriever(BaseRetriever):
+    """
+    Small-to-big retriever: searches the embedded child chunks and returns
+    the (larger) parent chunks they belong to, deduplicated, in rank order.
+    """
+
+    child_retriever: Any
+    parents: Dict[str, dict]
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        docs: List[Document] = []
+        seen = set()
+        for child in self.child_retriever.invoke(query):
+            parent_id = child.metadata.get("parent_id")
+            parent = self.parents.get(parent_id) if parent_id else None
+            if parent is None:
+                # Child without a stored parent: return it as is
+                docs.append(child)
+                continue
+            if parent_id in seen:
+                continue
+            seen.add(parent_id)
+            docs.append(Document(page_content=parent["page_content"], metadata=parent["metadata"]))
+        return docs
 
 
 class RetrievalService:
@@ -79,7 +111,7 @@ class RetrievalService:
             results = []
             for i, doc in enumerate(docs, 1):
                 fname = doc.metadata.get("file_name", "unknown")
-                content = getattr(doc, "page_content", "")[:500]
+                content = getattr(doc, "page_content", "")[:MAX_DOC_CHARS]
                 results.append(f"📄 Doc {i} ({fname}):\n{content}\n")
 
             return "\n---\n".join(results)
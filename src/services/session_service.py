@@ -1,12 +1,30 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Optional
+
+from cachetools import TTLCache
+
 from src.db.session_repository import SessionRepository
 from src.core.state import SidekickState
 
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 512))
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", 3600))
+
 
 class SessionService:
     def __init__(self, session_repo: SessionRepository):
         self.session_repo = session_repo
         # cache en memoria: clave = (username, folder)
-        self.sessions = {}
+        # Bounded LRU with TTL: idle or evicted sessions are simply reloaded
+        # from the DB (every save is write-through or queued, so nothing is lost).
+        self.sessions = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+
+        # Background writer: a single coroutine drains queued saves so writes
+        # are serialized on the shared aiosqlite connection.
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._pending = Counter()
 
     def _key(self, username: str, folder: str) -> tuple:
         return (username, folder or "")
@@ -33,3 +51,61 @@ class SessionService:
         key = self._key(username, folder)
         self.sessions[key] = state
         self.session_repo.save(username, folder, state)
+
+    async def load_async(self, username: str, folder: str) -> SidekickState:
+        """
+        Async variant of load(): cache hit is immediate, DB fallback goes
+        through aiosqlite so the event loop is not blocked.
+        """
+        key = self._key(username, folder)
+
+        if key in self.sessions:
+            return self.sessions[key]
+
+        # Evicted while a background save is still queued: let it land first
+        if self._pending[key]:
+            await self.flush()
+
+        state = await self.session_repo.load_async(username, folder)
+        self.sessions[key] = state
+        return state
+
+    async def save_async(self, username: str, folder: str, state: SidekickState):
+        """
+        Async variant of save(): updates cache and persists via aiosqlite.
+        Goes through the background writer (so all async saves are
+        serialized) and returns once the write has landed.
+        """
+        self.save_in_background(username, folder, state)
+        await self.flush()
+
+    def save_in_background(self, username: str, folder: str, state: SidekickState):
+        """
+        Update the cache now and queue the DB write for the background
+        writer, so the caller does not wait on SQLite.
+        """
+        key = self._key(username, folder)
+        self.sessions[key] = state
+
+        if self._writer_task is None or self._writer_task.done():
+            self._write_queue = self._write_queue or asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._drain_writes())
+
+        self._pending[key] += 1
+        self._write_queue.put_nowait((key, username, folder, state))
+
+    async def flush(self):
+        """Wait until every queued background save has been written."""
+        if self._write_queue is not None:
+            await self._write_queue.join()
+
+    async def _drain_writes(self):
+        while True:
+            key, username, folder, state = await self._write_queue.get()
+            try:
+                await self.session_repo.save_async(username, folder, state)
+            finally:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                self._write_queue.task_done()
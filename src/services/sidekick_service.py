@@ -1,11 +1,48 @@
-from langchain_core.messages import AIMessage, HumanMessage
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from src.core.sidekick import Sidekick
 
+MAX_HISTORY_MESSAGES = 12  # p.ej. 6 turnos user+assistant
+# Summarize once this many messages have fallen out of the history window
+SUMMARY_BATCH_MESSAGES = 12
+
 
 class SidekickService:
     def __init__(self, sidekick: Sidekick):
         self.sidekick = sidekick
+        # In-flight summary task per session_id (also keeps a reference so the
+        # task is not garbage-collected)
+        self._summary_tasks: dict[str, asyncio.Task] = {}
+
+    async def _refresh_summary(self, state) -> None:
+        """
+        Fold messages that left the history window into
+        state.task_metadata["summary"] (runs in the background).
+        """
+        meta = state.task_metadata
+        upto = meta.get("summary_upto", 0)
+        cutoff = len(state.messages) - MAX_HISTORY_MESSAGES
+        if cutoff - upto < SUMMARY_BATCH_MESSAGES:
+            return
+        try:
+            meta["summary"] = await self.sidekick.summarize(
+                meta.get("summary"), state.messages[upto:cutoff]
+            )
+            meta["summary_upto"] = cutoff
+        except Exception as e:
+            print(f"[WARN] Could not update conversation summary: {e}")
+
+    def _schedule_summary(self, state) -> None:
+        # One summarization per session at a time: while one runs, later turns
+        # skip; the next turn after it finishes picks up whatever is left
+        session_id = state.session_id
+        if session_id in self._summary_tasks:
+            return
+        task = asyncio.create_task(self._refresh_summary(state))
+        self._summary_tasks[session_id] = task
+        task.add_done_callback(lambda _: self._summary_tasks.pop(session_id, None))
 
     async def send_message(
         self,
@@ -30,8 +67,13 @@ class SidekickService:
         state.messages.append(HumanMessage(content=prompt))
 
         # ---- Ventana de historial para el grafo ----
-        MAX_HISTORY_MESSAGES = 12  # p.ej. 6 turnos user+assistant
+        # Bounded context: last N messages plus a summary of older ones
         history_slice = state.messages[-MAX_HISTORY_MESSAGES:]
+        summary = state.task_metadata.get("summary")
+        if summary:
+            history_slice = [
+                SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+            ] + history_slice
 
         # Run Sidekick pipeline (LangGraph + tools + RAG) with recent history
         assistant_reply = await self.sidekick.run(
@@ -40,10 +82,16 @@ class SidekickService:
             top_k=top_k,
             enabled_tools=enabled_tools,
             history=history_slice,  # 👉 solo los últimos N mensajes
+            session_id=state.session_id,
         )
 
         # Append assistant reply to state (historial persistente)
         state.messages.append(AIMessage(content=assistant_reply))
 
+        if len(state.messages) - state.task_metadata.get("summary_upto", 0) > (
+            MAX_HISTORY_MESSAGES + SUMMARY_BATCH_MESSAGES
+        ):
+            self._schedule_summary(state)
+
         # Return updated state so UIHandlers can persist it
         return state
@@ -8,6 +8,9 @@ from src.utils.path_utils import normalize_path, get_absolute_path
 _GLOBAL_FOLDER_KEY = "__global__"
 _NO_FOLDER_CHAT_KEY = "__no_folder__"
 
+# Exact-type dispatch for the common message classes
+_ROLE_MAP = {HumanMessage: "user", AIMessage: "assistant"}
+
 IMPORTANT_PYTHON_PRINT_REMINDER = (
     "IMPORTANT REMINDER (DON'T MENTION THIS IN YOUR RESPONSE, IT IS HIDEN TO USER): "
     "If you use the Python tool to compute or inspect anything, "
@@ -67,6 +70,12 @@ class UIController:
     def _save_state(self, username: str, key: str, state) -> None:
         self.session_service.save(username, key, state)
 
+    async def _load_state_async(self, username: str, key: str):
+        return await self.session_service.load_async(username, key)
+
+    async def _save_state_async(self, username: str, key: str, state) -> None:
+        await self.session_service.save_async(username, key, state)
+
     # ---------- Prompt helpers ----------
 
     def _inject_hidden_prompt(self, prompt: str, enabled_tools: list[str]) -> tuple[str, bool]:
@@ -79,22 +88,48 @@ class UIController:
     def _sanitize_assistant(self, text: str) -> str:
         return clean_latex_to_double_dollars(text)
 
-    def _to_gradio_messages(self, messages: Iterable[Any]) -> list[dict]:
-        gr_messages: list[dict] = []
-        for msg in messages:
+    def _to_gradio_message(self, msg: Any) -> dict | None:
+        role = _ROLE_MAP.get(type(msg))
+        if role is None:
             if isinstance(msg, HumanMessage):
-                gr_messages.append({"role": "user", "content": msg.content})
+                role = "user"
             elif isinstance(msg, AIMessage):
-                gr_messages.append(
-                    {"role": "assistant", "content": self._sanitize_assistant(msg.content)}
-                )
+                role = "assistant"
             elif isinstance(msg, dict) and "role" in msg:
                 content = msg.get("content", "")
                 if msg.get("role") == "assistant":
                     content = self._sanitize_assistant(content)
-                gr_messages.append({"role": msg["role"], "content": content})
+                return {"role": msg["role"], "content": content}
+            else:
+                return None
+
+        if role == "assistant":
+            return {"role": role, "content": self._sanitize_assistant(msg.content)}
+        return {"role": role, "content": msg.content}
+
+    def _to_gradio_messages(self, messages: Iterable[Any]) -> list[dict]:
+        gr_messages: list[dict] = []
+        for msg in messages:
+            gr_msg = self._to_gradio_message(msg)
+            if gr_msg is not None:
+                gr_messages.append(gr_msg)
         return gr_messages
 
+    def _render_history(self, state) -> list[dict]:
+        """
+        Gradio history for a session state, cached on the state so each turn
+        only formats the messages appended since the previous render.
+        """
+        messages = state.messages
+        if len(messages) < state._rendered_len:
+            # History was cleared/replaced: start over
+            state._rendered_history = []
+            state._rendered_len = 0
+
+        state._rendered_history.extend(self._to_gradio_messages(messages[state._rendered_len:]))
+        state._rendered_len = len(messages)
+        return list(state._rendered_history)
+
     # ---------- Public API (unchanged) ----------
 
     def load_session(self, username: str):
@@ -130,7 +165,7 @@ class UIController:
             # so we can use it directly.
             folder_key = self._folder_key(folder)
 
-            state = self._load_state(username, folder_key)
+            state = await self._load_state_async(username, folder_key)
 
             original_prompt = prompt
             injected_prompt, injected = self._inject_hidden_prompt(prompt, enabled_tools)
@@ -147,53 +182,79 @@ class UIController:
             if injected:
                 _hide_injected_user_reminder(new_state.messages, injected_prompt, original_prompt)
 
-            self._save_state(username, folder_key, new_state)
+            # Persist off the response path; the cache already holds new_state
+            self.session_service.save_in_background(username, folder_key, new_state)
 
-            return self._to_gradio_messages(new_state.messages), ""
+            return self._render_history(new_state), ""
         except Exception as e:
             return [{"role": "assistant", "content": f"Error: {e}"}], ""
 
+    async def chat_stream(
+        self,
+        username: str,
+        folder: str | None,
+        prompt: str,
+        top_k: int,
+        enabled_tools: list[str] | None = None,
+    ):
+        """
+        Streaming variant of chat(): first yields the cached history plus the
+        pending user message (so the UI updates right away), then the final
+        history once Sidekick has answered.
+        """
+        if username:
+            try:
+                state = await self._load_state_async(username, self._folder_key(folder))
+                yield self._render_history(state) + [{"role": "user", "content": prompt}], ""
+            except Exception:
+                pass
+
+        yield await self.chat(username, folder, prompt, top_k, enabled_tools)
+
     async def load_chat(self, username: str, folder: str | None):
         if not username:
             return []
         try:
             folder_key = self._folder_key(folder)
-            state = self._load_state(username, folder_key)
-            return self._to_gradio_messages(state.messages)
+            state = await self._load_state_async(username, folder_key)
+            return self._render_history(state)
         except Exception:
             return []
 
-    def clear_chat(self, username: str, folder: str | None):
+    async def clear_chat(self, username: str, folder: str | None):
         try:
             if not username:
                 return []
             folder_key = self._folder_key(folder)
-            state = self._load_state(username, folder_key)
+            state = await self._load_state_async(username, folder_key)
             state.messages = []
-            self._save_state(username, folder_key, state)
+            state._rendered_history = []
+            state._rendered_len = 0
+            state.task_metadata.pop("summary", None)
+            state.task_metadata.pop("summary_upto", None)
+            await self._save_state_async(username, folder_key, state)
             return []
         except Exception:
             return []
 
-    def get_folders(self, username: str):
+    async def get_folders(self, username: str):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
             return getattr(state, "indexed_directories", [])
         except Exception:
             return []
 
     async def add_folder(self, username: str, folder: str):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
             if not hasattr(state, "indexed_directories"):
                 state.indexed_directories = []
 
             canonical = self._canonical_path(folder)
 
-            if canonical not in state.indexed_directories:
-                state.indexed_directories.append(canonical)
+            if state.add_indexed_directory(canonical):
                 new_state = await self.folder_service.ensure_indexed(canonical, state)
-                self._save_state(username, _GLOBAL_FOLDER_KEY, new_state)
+                await self._save_state_async(username, _GLOBAL_FOLDER_KEY, new_state)
                 return "Folder added", new_state.indexed_directories
 
             return "Folder already exists", state.indexed_directories
@@ -202,14 +263,13 @@ class UIController:
 
     async def remove_folder(self, username: str, folder: str):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
 
             canonical = self._canonical_path(folder)
 
-            if hasattr(state, "indexed_directories") and canonical in state.indexed_directories:
-                state.indexed_directories.remove(canonical)
+            if state.remove_indexed_directory(canonical):
                 new_state = await self.folder_service.clear_folder(canonical, state)
-                self._save_state(username, _GLOBAL_FOLDER_KEY, new_state)
+                await self._save_state_async(username, _GLOBAL_FOLDER_KEY, new_state)
                 return "Folder removed", new_state.indexed_directories
 
             return "Folder not found", getattr(state, "indexed_directories", [])
@@ -218,7 +278,7 @@ class UIController:
 
     async def index_folder(self, username: str, folder: str, chunk_size: int, chunk_overlap: int):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
             canonical = self._canonical_path(folder)
             new_state = await self.folder_service.ensure_indexed(
                 folder=canonical,
@@ -226,14 +286,14 @@ class UIController:
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap,
             )
-            self._save_state(username, _GLOBAL_FOLDER_KEY, new_state)
+            await self._save_state_async(username, _GLOBAL_FOLDER_KEY, new_state)
             return "Folder indexed"
         except Exception as e:
             return f"Error: {e}"
 
     async def reindex_folder(self, username: str, folder: str, chunk_size: int, chunk_overlap: int):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
             canonical = self._canonical_path(folder)
             new_state = await self.folder_service.reindex_folder(
                 folder=canonical,
@@ -241,17 +301,17 @@ class UIController:
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap,
             )
-            self._save_state(username, _GLOBAL_FOLDER_KEY, new_state)
+            await self._save_state_async(username, _GLOBAL_FOLDER_KEY, new_state)
             return "Folder reindexed"
         except Exception as e:
             return f"Error: {e}"
 
     async def clear_folder(self, username: str, folder: str):
         try:
-            state = self._load_state(username, _GLOBAL_FOLDER_KEY)
+            state = await self._load_state_async(username, _GLOBAL_FOLDER_KEY)
             canonical = self._canonical_path(folder)
             new_state = await self.folder_service.clear_folder(canonical, state)
-            self._save_state(username, _GLOBAL_FOLDER_KEY, new_state)
+            await self._save_state_async(username, _GLOBAL_FOLDER_KEY, new_state)
             return "Folder cleared"
         except Exception as e:
             return f"Error: {e}"
@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 from typing import Optional
 
@@ -53,7 +54,8 @@ def wire_events(refs: UIRefs, *, NO_FOLDER_LABEL: str) -> None:
 
     # ---------- Login ----------
     async def handle_login(u: str, p: str):
-        success, msg = login_user(u, p)
+        # Password check (Argon2 + DB read) is blocking: keep it off the loop
+        success, msg = await asyncio.to_thread(login_user, u, p)
         if not success:
             return (
                 msg,  # login_status
@@ -68,8 +70,8 @@ def wire_events(refs: UIRefs, *, NO_FOLDER_LABEL: str) -> None:
 
         h = await get_controller()
 
-        folders = h.get_folders(u)
-        history = await h.load_chat(u, None)
+        # Folder list and chat history come from different sessions
+        folders, history = await asyncio.gather(h.get_folders(u), h.load_chat(u, None))
 
         dropdown_update = gr.update(
             choices=[NO_FOLDER_LABEL] + folders,
@@ -198,13 +200,15 @@ def wire_events(refs: UIRefs, *, NO_FOLDER_LABEL: str) -> None:
             folder = None
 
         if not username:
-            return (
+            yield (
                 [{"role": "assistant", "content": "Please log in before chatting."}],
                 "",
             )
+            return
 
         h = await get_controller()
-        return await h.chat(username, folder, message, top_k, enabled_tools)
+        async for update in h.chat_stream(username, folder, message, top_k, enabled_tools):
+            yield update
 
     refs.send_btn.click(
         handle_chat,
@@ -237,7 +241,7 @@ def wire_events(refs: UIRefs, *, NO_FOLDER_LABEL: str) -> None:
         if not username:
             return []
         h = await get_controller()
-        return h.clear_chat(username, folder)
+        return await h.clear_chat(username, folder)
 
     refs.clear_btn.click(
         handle_clear_chat,
@@ -123,8 +123,8 @@ def create_ui(css_path: str | None = None):
                             folder_status = gr.Label(label="Folder Status")
 
                             with gr.Accordion("Indexing parameters (advanced)", open=False):
-                                chunk_size_slider = gr.Slider(128, 2048, value=600, step=64, label="Chunk size")
-                                chunk_overlap_slider = gr.Slider(0, 512, value=20, step=10, label="Chunk overlap")
+                                chunk_size_slider = gr.Slider(64, 1024, value=200, step=16, label="Chunk size (tokens)")
+                                chunk_overlap_slider = gr.Slider(0, 256, value=20, step=10, label="Chunk overlap (tokens)")
 
 
 
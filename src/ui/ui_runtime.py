@@ -1,7 +1,9 @@
 import asyncio
 from typing import Optional
 
+from src.core.http_clients import close_http_clients
 from src.core.sidekick import init_sidekick
+from src.db.pool import close_shared_async_conn
 from src.db.session_repository import SessionRepository
 from src.services.folder_service import FolderService
 from src.services.session_service import SessionService
@@ -37,3 +39,11 @@ async def get_controller() -> UIController:
             )
 
     return _controller
+
+
+async def shutdown() -> None:
+    """
+    Release process-wide async resources once the UI has stopped serving.
+    """
+    await close_http_clients()
+    await close_shared_async_conn()
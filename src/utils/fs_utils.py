@@ -86,8 +86,6 @@ def delete_dir_verified(
             if os.path.exists(dir_abs):
                 shutil.rmtree(dir_abs, onerror=rm_onerror_make_writable)
 
-            time.sleep(sleep_s)
-
             if not os.path.exists(dir_abs):
                 if debug:
                     print(f"[DEBUG] rmtree SUCCESS (verified) on attempt {attempt}")
@@ -96,6 +94,9 @@ def delete_dir_verified(
             if debug:
                 print(f"[DEBUG] rmtree returned but dir STILL EXISTS (attempt {attempt})")
 
+            # Give the OS a moment to release handles before retrying
+            time.sleep(sleep_s)
+
         except Exception as e:
             last_err = str(e)
             if debug:
@@ -3,6 +3,7 @@ Utilities for path handling.
 """
 
 import os
+from functools import lru_cache
 from typing import Optional, List
 
 
@@ -34,8 +35,13 @@ def validate_directory(directory: str) -> bool:
     return os.path.exists(normalized) and os.path.isdir(normalized)
 
 
+@lru_cache(maxsize=256)
 def get_absolute_path(path: str) -> str:
-    """Get the absolute path in a safe way."""
+    """
+    Get the absolute path in a safe way.
+    Memoized: folder keys are resolved on every chat turn and the app never
+    changes its working directory.
+    """
     try:
         return os.path.abspath(normalize_path(path))
     except Exception: